@@ -0,0 +1,77 @@
+"""
+Time of the full backups report: the aggregation pass of VeleroChecker over the last backups
+and the text rendering of the report model, on synthetic records from 1k to 100k backups.
+The time per backup stays flat when the report is linear.
+
+    python benchmarks/backups_report.py
+"""
+import os
+import sys
+import asyncio
+import random
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from config.config import Config  # noqa: E402
+from config.config_k8s_process import ConfigK8sProcess  # noqa: E402
+from core import report_renderer  # noqa: E402
+from core.velero_checker import VeleroChecker  # noqa: E402
+from core.velero_records import BackupRecord  # noqa: E402
+
+SIZES = (1000, 10000, 50000, 100000)
+REPEAT = 3
+PHASES = ('Completed',) * 6 + ('PartiallyFailed', 'Failed', 'FailedValidation', 'InProgress')
+
+
+def make_backups(count):
+    now = int(time.time())
+    backups = {}
+    for index in range(count):
+        name = f"backup-{index:06d}"
+        created = now - random.randint(0, 30 * 86400)
+        phase = random.choice(PHASES)
+        backups[name] = BackupRecord(name=name,
+                                     phase=phase,
+                                     schedule=f"schedule-{index % 50}",
+                                     errors=random.choice((0, 0, 0, 3)),
+                                     warnings=random.choice((0, 0, 1)),
+                                     created=created,
+                                     completed=created + 180,
+                                     expiration=created + random.randint(1, 40) * 86400,
+                                     in_progress=phase == 'InProgress')
+    return backups
+
+
+def main():
+    # the config is read from the environment as the watchdog does
+    config = ConfigK8sProcess(Config())
+    checker = VeleroChecker(daemon=False, k8s_key_config=config)
+    process_backups_report = checker._VeleroChecker__process_backups_report
+    renderer = report_renderer.get_renderer(report_renderer.TEXT)
+    event_loop = asyncio.new_event_loop()
+
+    def build(data):
+        return event_loop.run_until_complete(process_backups_report(data, full_report=True))
+
+    def render(blocks):
+        return renderer.render(report_renderer.report('bench', blocks['backups']))
+
+    random.seed(len(SIZES))
+    print(f"{'backups':>8} {'build ms':>9} {'render ms':>10} {'chars':>9} {'us/backup':>10}")
+    for count in SIZES:
+        data = {config.backups_key: make_backups(count),
+                config.unschedule_namespace_key: {'difference': [], 'counter': 0, 'counter_all': 0}}
+        blocks = build(data)
+        text = render(blocks)
+        build_seconds = min(timeit.repeat(lambda: build(data), number=1, repeat=REPEAT))
+        render_seconds = min(timeit.repeat(lambda: render(blocks), number=1, repeat=REPEAT))
+        total = build_seconds + render_seconds
+        print(f"{count:>8} {build_seconds * 1000:>9.1f} {render_seconds * 1000:>10.1f} {len(text):>9} "
+              f"{total / count * 1e6:>10.2f}")
+    event_loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Time of the IGNORE_NM filter on the namespaces of a cycle, 5k namespaces and 9 patterns:
+- loop: the previous filter, every pattern compiled and tested in sequence on every call
+- combined: the single alternation regex, without the cache (first cycle after a reload)
+- cached: the LRU cache of the matcher (the following cycles)
+- fallback: the patterns matched one by one, used when a pattern has inline flags or groups
+
+    python benchmarks/ignored_namespaces.py [namespaces]
+"""
+import os
+import sys
+import random
+import re
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from core.velero_status import VeleroStatus  # noqa: E402
+
+PATTERNS = ['kube-.*', 'openshift-.*', 'cattle-.*', 'istio-.*', 'velero.*',
+            'tmp-[0-9]+', '.*-sandbox', 'monitoring', 'cert-manager']
+# the (?i) flag prevents the combined regex
+FALLBACK_PATTERNS = ['(?i)kube-.*'] + PATTERNS[1:]
+REPEAT = 5
+
+
+def make_namespaces(count):
+    prefixes = ('app', 'team', 'svc', 'kube', 'openshift', 'tmp', 'istio', 'data')
+    names = []
+    for index in range(count):
+        prefix = random.choice(prefixes)
+        suffix = f"{index}-sandbox" if index % 17 == 0 else str(index)
+        names.append(f"{prefix}-{suffix}")
+    return names
+
+
+def loop_filter(namespaces, patterns):
+    """
+    Previous filter
+    """
+    compiled_regex_list = [re.compile(pattern) for pattern in patterns]
+    filtered = []
+    for key in namespaces:
+        if not any(pattern.match(key) for pattern in compiled_regex_list):
+            filtered.append(key)
+    return filtered
+
+
+def make_status(patterns):
+    """
+    Status reader without kubernetes clients, only the matcher is used
+    """
+    status = VeleroStatus.__new__(VeleroStatus)
+    status.namespace_informer = None
+    status.set_ignored_namespace(patterns)
+    return status
+
+
+def matcher_filter(status, namespaces):
+    is_ignored_namespace = status.is_ignored_namespace
+    return [name for name in namespaces if not is_ignored_namespace(name)]
+
+
+def uncached_filter(status, namespaces):
+    status.is_ignored_namespace.cache_clear()
+    return matcher_filter(status, namespaces)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    random.seed(count)
+    namespaces = make_namespaces(count)
+
+    status = make_status(PATTERNS)
+    fallback = make_status(FALLBACK_PATTERNS)
+    assert status.ignored_namespace_regex is not None and fallback.ignored_namespace_regex is None
+    expected = loop_filter(namespaces, PATTERNS)
+    assert matcher_filter(status, namespaces) == expected
+    assert matcher_filter(fallback, namespaces) == expected
+
+    cases = (('loop', lambda: loop_filter(namespaces, PATTERNS)),
+             ('combined', lambda: uncached_filter(status, namespaces)),
+             ('cached', lambda: matcher_filter(status, namespaces)),
+             ('fallback', lambda: uncached_filter(fallback, namespaces)))
+    print(f"namespaces: {count} patterns: {len(PATTERNS)} kept: {len(expected)}")
+    for name, function in cases:
+        seconds = min(timeit.repeat(function, number=1, repeat=REPEAT))
+        print(f"{name:>9}: {seconds * 1000:7.2f} ms {seconds / count * 1e6:6.2f} us/namespace")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Time of the last backup per schedule: the newest backup index built while the backups are
+read and the last backups map derived from it, on synthetic records from 1k to 100k backups.
+The previous algorithm, a scan of the last backups for every backup, is timed up to 10k backups.
+
+The time per backup of the index grows only with the cache misses of a larger working set,
+the time per backup of the scan grows with the number of backups.
+
+    python benchmarks/last_backup_index.py [schedules]
+"""
+import os
+import sys
+import random
+import timeit
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from core.velero_records import BackupRecord  # noqa: E402
+from core.velero_status import VeleroStatus  # noqa: E402
+
+SIZES = (1000, 10000, 100000)
+SCAN_MAX_SIZE = 10000
+REPEAT = 3
+
+index_last_backup = VeleroStatus._VeleroStatus__index_last_backup
+get_k8s_last_backups = VeleroStatus._VeleroStatus__get_k8s_last_backups
+
+
+def make_records(count, schedules):
+    """
+    Backups in random order, one out of ten without schedule
+    """
+    records = []
+    for index in range(count):
+        schedule = None if index % 10 == 0 else f"schedule-{index % schedules}"
+        created = 1704067200 + index * 60
+        records.append(BackupRecord(name=f"backup-{index:06d}",
+                                    phase='Completed',
+                                    schedule=schedule,
+                                    created=created,
+                                    completed=created + 180,
+                                    expiration=created + 30 * 86400))
+    random.shuffle(records)
+    return records
+
+
+def last_backups(records):
+    all_backups = OrderedDict()
+    newest = {}
+    for backup_info in records:
+        all_backups[backup_info.name] = backup_info
+        index_last_backup(newest, backup_info.name, backup_info)
+    return get_k8s_last_backups(None, all_backups, newest)
+
+
+def scan_last_backups(records):
+    """
+    Previous algorithm: the last backups are scanned for the schedule of every backup
+    """
+    last_backup_info = OrderedDict()
+    for backup_info in records:
+        backup_name = backup_info.name
+        schedule_name = backup_info.schedule
+
+        backup_same_schedule_name = None
+        schedules = []
+        backup_same_schedule_data = None
+        if schedule_name is not None:
+            schedules = [last_backup_info[item].schedule for item in dict(last_backup_info)]
+            backup_same_schedule_name = next(
+                (item for item in last_backup_info if last_backup_info[item].schedule == schedule_name), None)
+            if backup_same_schedule_name is not None:
+                backup_same_schedule_data = last_backup_info[backup_same_schedule_name]
+
+        if schedule_name is None \
+                or schedule_name not in schedules \
+                or (backup_same_schedule_data is not None and backup_name > backup_same_schedule_data.name):
+            if backup_same_schedule_name is not None:
+                del last_backup_info[backup_same_schedule_name]
+            last_backup_info[backup_name] = backup_info
+    return last_backup_info
+
+
+def main():
+    schedules = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    random.seed(schedules)
+    print(f"schedules: {schedules}")
+    print(f"{'backups':>8} {'last':>6} {'index ms':>9} {'us/backup':>10} {'scan ms':>9} {'us/backup':>10}")
+    for count in SIZES:
+        records = make_records(count, schedules)
+        last = last_backups(records)
+        seconds = min(timeit.repeat(lambda: last_backups(records), number=1, repeat=REPEAT))
+        line = f"{count:>8} {len(last):>6} {seconds * 1000:>9.1f} {seconds / count * 1e6:>10.2f}"
+        if count <= SCAN_MAX_SIZE:
+            seconds = min(timeit.repeat(lambda: scan_last_backups(records), number=1, repeat=1))
+            line += f" {seconds * 1000:>9.1f} {seconds / count * 1e6:>10.2f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
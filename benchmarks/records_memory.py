@@ -0,0 +1,128 @@
+"""
+Memory of the backups kept by the watchdog: the dict layout used before the records
+and the BackupRecord layout, measured with tracemalloc on synthetic Backup objects.
+
+Both layouts are measured in the steady state of a cycle: the informer store plus the
+previous snapshot (old_data) and the current one. The api objects are created before the
+measurement starts, so the status dicts kept by the dict layout are not counted.
+
+    python benchmarks/records_memory.py [backups]
+"""
+import os
+import sys
+import gc
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from core.velero_records import BackupRecord  # noqa: E402
+
+SCHEDULES = 50
+
+
+def make_backup(index):
+    """
+    Backup custom object as returned by the api server, the spec is omitted
+    """
+    created = datetime(2024, 1, 1) + timedelta(minutes=index)
+    schedule = f"schedule-{index % SCHEDULES}"
+    return {'apiVersion': 'velero.io/v1',
+            'kind': 'Backup',
+            'metadata': {'name': f"{schedule}-{created.strftime('%Y%m%d%H%M%S')}",
+                         'namespace': 'velero',
+                         'labels': {'velero.io/schedule-name': schedule,
+                                    'velero.io/storage-location': 'default'},
+                         'creationTimestamp': created.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                         'resourceVersion': str(1000000 + index)},
+            'status': {'phase': random.choice(('Completed', 'Completed', 'Completed', 'PartiallyFailed')),
+                       'expiration': (created + timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                       'startTimestamp': created.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                       'completionTimestamp': (created + timedelta(minutes=3)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                       'formatVersion': '1.1.0',
+                       'version': 1,
+                       'errors': random.choice((0, 0, 0, 2)),
+                       'warnings': random.choice((0, 1)),
+                       'progress': {'itemsBackedUp': 420, 'totalItems': 420}}}
+
+
+def legacy_compact(backup):
+    """
+    Informer transform used with the dict layout: metadata subset and the whole status
+    """
+    metadata = backup.get('metadata', {})
+    return {'metadata': {'name': metadata.get('name'),
+                         'labels': metadata.get('labels', {}),
+                         'creationTimestamp': metadata.get('creationTimestamp', ''),
+                         'resourceVersion': metadata.get('resourceVersion')},
+            'status': backup.get('status', {})}
+
+
+def legacy_info(backup):
+    """
+    Backup dict of the previous layout, built again by every cycle
+    """
+    status = backup['status']
+    time_expires = status.get('expiration', 'N/A')
+    backup_info = {'backup_name': backup['metadata']['name'],
+                   'phase': status.get('phase', ''),
+                   'namespace': backup.get('namespace', ''),
+                   'errors': status.get('errors', []),
+                   'warnings': status.get('warnings', []),
+                   'time_expires': time_expires,
+                   'schedule': backup['metadata']['labels'].get('velero.io/schedule-name'),
+                   'creation_timestamp': backup['metadata'].get('creationTimestamp', ''),
+                   'completion_timestamp': status.get('completionTimestamp', 'N/A'),
+                   'expire': str((datetime.strptime(time_expires, '%Y-%m-%dT%H:%M:%SZ') - datetime.now()).days) + 'd'}
+    backup_info['fingerprint'] = hash(tuple(backup_info.items()))
+    return backup_info
+
+
+def legacy_layout(objects):
+    store = {item['metadata']['name']: legacy_compact(item) for item in objects}
+    old_data = {name: legacy_info(item) for name, item in store.items()}
+    new_data = {name: legacy_info(item) for name, item in store.items()}
+    return store, old_data, new_data
+
+
+def records_layout(objects):
+    store = {}
+    for item in objects:
+        record = BackupRecord.from_k8s(item)
+        store[record.name] = record
+    # the snapshots share the records of the informer store
+    old_data = dict(store)
+    new_data = dict(store)
+    return store, old_data, new_data
+
+
+def measure(layout, count):
+    """
+    @return: bytes allocated by the layout, the api objects are released once transformed
+    """
+    random.seed(count)
+    objects = [make_backup(index) for index in range(count)]
+    gc.collect()
+    tracemalloc.start()
+    result = layout(objects)
+    del objects
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    legacy = measure(legacy_layout, count)
+    records = measure(records_layout, count)
+    print(f"backups: {count}")
+    print(f"dict layout:   {legacy / 1024 / 1024:7.1f} MB")
+    print(f"record layout: {records / 1024 / 1024:7.1f} MB")
+    print(f"reduction:     {legacy / records:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,17 @@
 import os
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app_data import __app_name__, __version__, __date__
 import asyncio
 from core.dispatcher_apprise import DispatcherApprise
 
 from api.common.response_model.successful_request import SuccessfulRequest
+from api.common.response_model.failed_request import FailedRequest
 from api.schemas.apprise_test_provider import AppriseTestService
 
 from watchdog import Watchdog
 from config.config import Config, get_configmap
+from utils import metrics
 
 app = FastAPI()
 
@@ -39,10 +41,22 @@ async def info():
 @app.post("/send-report",
           tags=['Run'],
           summary='Send report')
-async def report():
-    wd = Watchdog(daemon=False)
-    await wd.run()
-    res = {'sent': 'Done!'}
+async def report(refresh: bool = False):
+    # the report is built from the daemon snapshot, refresh=true reads the cluster again
+    job_id = await app.watchdog_daemon.request_report(refresh=refresh)
+    res = {'job_id': job_id}
+    response = SuccessfulRequest(payload=res)
+    return JSONResponse(content=response.toJSON(), status_code=202)
+
+
+@app.get("/send-report/{job_id}",
+         tags=['Run'],
+         summary='Get the status of a report request')
+async def report_status(job_id: str):
+    res = await app.watchdog_daemon.get_report_job(job_id)
+    if res is None:
+        response = FailedRequest(title='Report', description=f'job {job_id} not found')
+        return JSONResponse(content=response.toJSON(), status_code=404)
     response = SuccessfulRequest(payload=res)
     return JSONResponse(content=response.toJSON(), status_code=200)
 
@@ -57,6 +71,22 @@ async def get_config():
     return JSONResponse(content=response.toJSON(), status_code=200)
 
 
+@app.get("/metrics",
+         tags=['System'],
+         summary='Velero backups state and watchdog internals in Prometheus text format')
+async def get_metrics():
+    return PlainTextResponse(content=metrics.registry.render(), media_type='text/plain; version=0.0.4')
+
+
+@app.get("/notifications/dead-letters",
+         tags=['Notifications'],
+         summary='Get the notifications not delivered after the max number of attempts')
+async def get_dead_letters():
+    res = await app.watchdog_daemon.get_dead_letters()
+    response = SuccessfulRequest(payload=res)
+    return JSONResponse(content=response.toJSON(), status_code=200)
+
+
 @app.post("/test-service",
           tags=['Run'],
           summary='Send a test message to verify channel settings')
@@ -3,10 +3,16 @@ from dotenv import load_dotenv, find_dotenv
 from dotenv.main import dotenv_values
 
 from utils.handle_error import handle_exceptions_method
+from utils.logger import ColoredLogger
+import logging
 
-from kubernetes import client, config
+from kubernetes import client
+
+from utils.k8s_client import get_core_v1_api
 import base64
 
+logger = ColoredLogger.get_logger(__name__, level=logging.INFO)
+
 
 def get_configmap(namespace: str, configmap_name: str) -> {}:
     """
@@ -16,14 +22,8 @@ def get_configmap(namespace: str, configmap_name: str) -> {}:
     :param configmap_name: Name of the ConfigMap.
     :return: Value of the parameter or None if the key does not exist.
     """
-    # Load Kubernetes configuration
-    try:
-        config.load_incluster_config()  # Use cluster context if the app is running in the cluster.
-    except config.ConfigException:
-        config.load_kube_config()  # Use local kubeconfig file if running locally.
-
-    # Initialize the API client
-    v1 = client.CoreV1Api()
+    # Shared api client, the connections are reused across calls
+    v1 = get_core_v1_api()
 
     try:
         # Read the specified ConfigMap.
@@ -34,9 +34,9 @@ def get_configmap(namespace: str, configmap_name: str) -> {}:
     except client.exceptions.ApiException as e:
         # Handle errors, e.g. ConfigMap not found.
         if e.status == 404:
-            print(f"ConfigHelper ConfigMap '{configmap_name}' not found in '{namespace}'.")
+            logger.warning(f"ConfigHelper ConfigMap '{configmap_name}' not found in '{namespace}'.")
         else:
-            print(f"ConfigHelper Error while reading the ConfigMap: {e}")
+            logger.error(f"ConfigHelper Error while reading the ConfigMap: {e}")
         return None
 
 
@@ -49,14 +49,8 @@ def get_configmap_parameter(namespace: str, configmap_name: str, parameter: str)
     :param parameter: Key of the parameter to be read.
     :return: Value of the parameter or None if the key does not exist.
     """
-    # Load Kubernetes configuration
-    try:
-        config.load_incluster_config()  # Use cluster context if the app is running in the cluster.
-    except config.ConfigException:
-        config.load_kube_config()  # Use local kubeconfig file if running locally.
-
-    # Initialize the API client
-    v1 = client.CoreV1Api()
+    # Shared api client, the connections are reused across calls
+    v1 = get_core_v1_api()
 
     try:
         # Read the specified ConfigMap.
@@ -67,9 +61,9 @@ def get_configmap_parameter(namespace: str, configmap_name: str, parameter: str)
     except client.exceptions.ApiException as e:
         # Handle errors, e.g. ConfigMap not found.
         if e.status == 404:
-            print(f"ConfigHelper ConfigMap '{configmap_name}' not found in '{namespace}'.")
+            logger.warning(f"ConfigHelper ConfigMap '{configmap_name}' not found in '{namespace}'.")
         else:
-            print(f"ConfigHelper Error while reading the ConfigMap: {e}")
+            logger.error(f"ConfigHelper Error while reading the ConfigMap: {e}")
         return None
 
 
@@ -82,14 +76,8 @@ def get_secret_parameter(namespace: str, secret_name: str, parameter: str) -> st
     :param parameter: The key of the parameter to read.
     :return: The decoded value of the parameter, or None if the key does not exist.
     """
-    # Load the Kubernetes configuration
-    try:
-        config.load_incluster_config()  # Use in-cluster config when running inside a Kubernetes cluster
-    except config.ConfigException:
-        config.load_kube_config()  # Use local kubeconfig when running outside the cluster
-
-    # Initialize the CoreV1Api client
-    v1 = client.CoreV1Api()
+    # Shared api client, the connections are reused across calls
+    v1 = get_core_v1_api()
 
     try:
         # Retrieve the specified Secret
@@ -104,9 +92,9 @@ def get_secret_parameter(namespace: str, secret_name: str, parameter: str) -> st
     except client.exceptions.ApiException as e:
         # Handle API exceptions (e.g., Secret not found)
         if e.status == 404:
-            print(f"ConfigHelper Secret '{secret_name}' not found in namespace '{namespace}'.")
+            logger.warning(f"ConfigHelper Secret '{secret_name}' not found in namespace '{namespace}'.")
         else:
-            print(f"ConfigHelper Error reading the Secret: {e}")
+            logger.error(f"ConfigHelper Error reading the Secret: {e}")
         return None
 
 
@@ -126,9 +114,9 @@ class Config:
             if mask_value and len(value) > 2:
                 index = int(len(value) / 2)
                 partial = '*' * index
-                print(f"ConfigHelper load_key.key={key} value={value[:index]}{partial}")
+                logger.info("ConfigHelper load_key.key=%s value=%s%s", key, value[:index], partial)
             else:
-                print(f"ConfigHelper load_key.key={key} value={value}")
+                logger.info("ConfigHelper load_key.key=%s value=%s", key, value)
 
         return value
 
@@ -195,6 +183,11 @@ class Config:
         default = '%(asctime)s :: [%(levelname)s] :: %(message)s'
         return self.load_key('LOG_FORMAT', default)
 
+    @handle_exceptions_method
+    def logger_json_output(self):
+        res = self.load_key('LOG_JSON', 'False')
+        return True if res.lower() == 'true' else False
+
     @handle_exceptions_method
     def logger_save_to_file(self):
         res = self.load_key('LOG_SAVE', 'False')
@@ -237,6 +230,22 @@ class Config:
     def get_k8s_velero_ui_namespace():
         return os.getenv('K8S_VELERO_UI_NAMESPACE', 'velero-ui')
 
+    @staticmethod
+    def get_user_configmap_name():
+        return f"{os.getenv('HELM_RELEASE_NAME')}-watchdog-user-config"
+
+    @staticmethod
+    def get_user_secret_name():
+        return f"{os.getenv('HELM_RELEASE_NAME')}-watchdog-user-secret"
+
+    @handle_exceptions_method
+    def user_config_watch_enable(self):
+        # the user ConfigMap and Secret exist only in a helm release
+        if os.getenv('HELM_RELEASE_NAME') is None:
+            return False
+        res = self.load_key('USER_CONFIG_WATCH', 'True')
+        return True if res.lower() == "true" or res.lower() == "1" else False
+
     #
     # run app config
     #
@@ -258,6 +267,32 @@ class Config:
 
         return n_hours
 
+    @handle_exceptions_method
+    def notification_timeout_sec(self):
+        return int(self.load_key('NOTIFICATION_TIMEOUT_SEC', '30'))
+
+    @handle_exceptions_method
+    def notification_max_msg_len(self):
+        return int(self.load_key('NOTIFICATION_MAX_MSG_LEN', '50000'))
+
+    @handle_exceptions_method
+    def notification_retry_max_attempts(self):
+        return int(self.load_key('NOTIFICATION_RETRY_MAX_ATTEMPTS', '5'))
+
+    @handle_exceptions_method
+    def notification_retry_base_sec(self):
+        return int(self.load_key('NOTIFICATION_RETRY_BASE_SEC', '10'))
+
+    @handle_exceptions_method
+    def notification_retry_max_sec(self):
+        return int(self.load_key('NOTIFICATION_RETRY_MAX_SEC', '600'))
+
+    @handle_exceptions_method
+    def notification_outbox_file(self):
+        res = self.load_key('NOTIFICATION_OUTBOX_FILE', './data/outbox.db')
+        # 'none' disables the outbox
+        return '' if res.lower() in ['none', 'false'] else res
+
     #
     # k8s config
     #
@@ -279,6 +314,45 @@ class Config:
         res = self.load_key('K8S_IN_CLUSTER_MODE', 'False')
         return True if res.lower() == "true" or res.lower() == "1" else False
 
+    @handle_exceptions_method
+    def k8s_watch_enable(self):
+        res = self.load_key('K8S_WATCH_MODE', 'True')
+        return True if res.lower() == "true" or res.lower() == "1" else False
+
+    @handle_exceptions_method
+    def k8s_watch_timeout_sec(self):
+        return int(self.load_key('K8S_WATCH_TIMEOUT_SEC', '300'))
+
+    @handle_exceptions_method
+    def k8s_list_page_size(self):
+        return int(self.load_key('K8S_LIST_PAGE_SIZE', '500'))
+
+    @handle_exceptions_method
+    def k8s_api_workers(self):
+        return int(self.load_key('K8S_API_WORKERS', '4'))
+
+    @handle_exceptions_method
+    def k8s_api_timeout_sec(self):
+        return int(self.load_key('K8S_API_TIMEOUT_SEC', '30'))
+
+    @handle_exceptions_method
+    def k8s_api_pool_size(self):
+        return int(self.load_key('K8S_API_POOL_SIZE', '16'))
+
+    @handle_exceptions_method
+    def k8s_backup_label_selector(self):
+        return self.load_key('K8S_BACKUP_LABEL_SELECTOR', '')
+
+    @handle_exceptions_method
+    def k8s_schedule_label_selector(self):
+        return self.load_key('K8S_SCHEDULE_LABEL_SELECTOR', '')
+
+    @handle_exceptions_method
+    def k8s_monitored_schedules(self):
+        res = self.load_key('K8S_MONITORED_SCHEDULES', '')
+        # comma separated schedule names, empty means all the schedules
+        return [name.strip() for name in res.split(',') if name.strip() != '']
+
     @handle_exceptions_method
     def get_regex_patterns_ignore_nm(self):
         regex_list = []
@@ -293,6 +367,16 @@ class Config:
                 break
         return regex_list
 
+    @handle_exceptions_method
+    def state_checkpoint_file(self):
+        res = self.load_key('STATE_CHECKPOINT_FILE', './data/checkpoint.json')
+        # 'none' disables the checkpoint
+        return '' if res.lower() in ['none', 'false'] else res
+
+    @handle_exceptions_method
+    def state_checkpoint_interval_sec(self):
+        return int(self.load_key('STATE_CHECKPOINT_INTERVAL_SEC', '60'))
+
     @staticmethod
     def get_build_version():
         return os.getenv('BUILD_VERSION', 'dev')
@@ -326,6 +410,13 @@ class Config:
 
         return "info"
 
+    @handle_exceptions_method
+    def get_debug_snapshot_every(self):
+        """
+        Dump the snapshot received by the checker at DEBUG level once every N cycles, 0 disables the dumps
+        """
+        return int(self.load_key('DEBUG_SNAPSHOT_EVERY', '1'))
+
     @staticmethod
     def get_env_variables():
         data = os.environ.copy()  # ✅ This reads the current environment variables.
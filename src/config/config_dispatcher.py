@@ -1,5 +1,10 @@
 from config.config import Config
 
+from utils.logger import ColoredLogger
+import logging
+
+logger = ColoredLogger.get_logger(__name__, level=logging.INFO)
+
 configHelper = Config()
 
 
@@ -7,6 +12,14 @@ class ConfigDispatcher:
     def __init__(self, cl_config: Config = None):
         self.max_msg_len = 50000
         self.alive_message = 24
+        self.notification_timeout = 30
+
+        self.retry_max_attempts = 5
+        self.retry_base_seconds = 10
+        self.retry_max_seconds = 600
+        self.dead_letter_size = 100
+
+        self.outbox_file = ''
 
         self.apprise_enable = True
         self.apprise_configs = []
@@ -19,7 +32,12 @@ class ConfigDispatcher:
         Print setup class
         """
 
-        print(f"ConfigDispatcher {self.apprise_configs}")
+        logger.info(f"ConfigDispatcher {self.apprise_configs}")
+        logger.info(f"ConfigDispatcher notification timeout={self.notification_timeout}s")
+        logger.info(f"ConfigDispatcher max message length={self.max_msg_len}")
+        logger.info(f"ConfigDispatcher outbox file={self.outbox_file}")
+        logger.info(f"ConfigDispatcher retry max attempts={self.retry_max_attempts} "
+                    f"base={self.retry_base_seconds}s max={self.retry_max_seconds}s")
 
     def __init_configuration_app__(self, cl_config: Config):
         """
@@ -28,6 +46,12 @@ class ConfigDispatcher:
         """
         # global
         self.alive_message = cl_config.notification_alive_message_hours()
+        self.notification_timeout = cl_config.notification_timeout_sec()
+        self.max_msg_len = cl_config.notification_max_msg_len()
+        self.retry_max_attempts = cl_config.notification_retry_max_attempts()
+        self.retry_base_seconds = cl_config.notification_retry_base_sec()
+        self.retry_max_seconds = cl_config.notification_retry_max_sec()
+        self.outbox_file = cl_config.notification_outbox_file()
         self.apprise_configs = configHelper.get_apprise_config()
 
         # print
@@ -1,11 +1,27 @@
 from config.config import Config
 
+from utils.logger import ColoredLogger
+import logging
+
+logger = ColoredLogger.get_logger(__name__, level=logging.INFO)
+
 
 class ConfigK8sProcess:
     def __init__(self, cl_config: Config = None):
         self.k8s_in_cluster_mode = True
         self.k8s_config_file = None
 
+        self.watch_enable = True
+        self.watch_timeout_seconds = 300
+        self.list_page_size = 500
+        self.api_workers = 4
+        self.api_timeout_seconds = 30
+
+        # server side filters of the velero objects
+        self.backup_label_selector = ''
+        self.schedule_label_selector = ''
+        self.monitored_schedules = []
+
         self.cluster_id = None
         self.cluster_name_key = 'cluster'
 
@@ -25,6 +41,9 @@ class ConfigK8sProcess:
         # LS 2023.11.23 add ignored namespaces
         self.ignore_namespace = []
 
+        self.checkpoint_file = ''
+        self.checkpoint_interval = 60
+
         if cl_config is not None:
             self.__init_configuration_app__(cl_config)
 
@@ -32,15 +51,23 @@ class ConfigK8sProcess:
         """
         Print setup class
         """
-        print(f"ConfigK8s cluster name= {self.cluster_id}")
+        logger.info(f"ConfigK8s cluster name= {self.cluster_id}")
+
+        logger.info(f"ConfigK8s in cluster mode={self.k8s_in_cluster_mode}")
+        logger.info(f"ConfigK8s config file={self.k8s_config_file}")
+        logger.info(f"ConfigK8s watch mode={self.watch_enable}")
+        logger.info(f"ConfigK8s list page size={self.list_page_size}")
+        logger.info(f"ConfigK8s api workers={self.api_workers} timeout={self.api_timeout_seconds}s")
+        logger.info(f"ConfigK8s backup label selector={self.backup_label_selector}")
+        logger.info(f"ConfigK8s schedule label selector={self.schedule_label_selector}")
+        logger.info(f"ConfigK8s monitored schedules={self.monitored_schedules}")
+        logger.info(f"ConfigK8s velero backup enable={self.backup_enable}")
+        logger.info(f"ConfigK8s velero schedule enable={self.schedule_enable}")
+        logger.info(f"ConfigK8s k8s send summary message={self.disp_msg_key_unique}")
 
-        print(f"ConfigK8s in cluster mode={self.k8s_in_cluster_mode}")
-        print(f"ConfigK8s config file={self.k8s_config_file}")
-        print(f"ConfigK8s velero backup enable={self.backup_enable}")
-        print(f"ConfigK8s velero schedule enable={self.schedule_enable}")
-        print(f"ConfigK8s k8s send summary message={self.disp_msg_key_unique}")
+        logger.info(f"ConfigK8s checkpoint file={self.checkpoint_file} interval={self.checkpoint_interval}s")
 
-        print(f"ConfigK8s k8s ignored namespaces: regex defined {len(self.ignore_namespace)}")
+        logger.info(f"ConfigK8s k8s ignored namespaces: regex defined {len(self.ignore_namespace)}")
 
     def __init_configuration_app__(self, cl_config: Config):
         """
@@ -52,6 +79,16 @@ class ConfigK8sProcess:
         self.cluster_id = cl_config.k8s_cluster_identification()
         self.k8s_in_cluster_mode = cl_config.k8s_incluster_mode()
         self.k8s_config_file = cl_config.k8s_config_file()
+        self.watch_enable = cl_config.k8s_watch_enable()
+        self.watch_timeout_seconds = cl_config.k8s_watch_timeout_sec()
+        self.list_page_size = cl_config.k8s_list_page_size()
+        self.api_workers = cl_config.k8s_api_workers()
+        self.api_timeout_seconds = cl_config.k8s_api_timeout_sec()
+        self.backup_label_selector = cl_config.k8s_backup_label_selector()
+        self.schedule_label_selector = cl_config.k8s_schedule_label_selector()
+        self.monitored_schedules = cl_config.k8s_monitored_schedules()
         self.ignore_namespace = cl_config.get_regex_patterns_ignore_nm()
+        self.checkpoint_file = cl_config.state_checkpoint_file()
+        self.checkpoint_interval = cl_config.state_checkpoint_interval_sec()
 
         self.__print_configuration__()
@@ -0,0 +1,103 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from config.config import Config
+
+from utils.logger import ColoredLogger
+import logging
+
+logger = ColoredLogger.get_logger(__name__, level=logging.INFO)
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    Immutable copy of the user configuration. It is parsed once, the hot paths read its attributes
+    and never the environment
+    """
+    version: int
+    loaded_at: float
+
+    velero_namespace: str
+    cluster_id: Optional[str]
+
+    schedule_enable: bool
+    backup_enable: bool
+    expires_days_warning: int
+    process_run_sec: int
+
+    report_backup_item_prefix: str
+    report_schedule_item_prefix: str
+
+    notification_skip_completed: bool
+    notification_skip_inprogress: bool
+    notification_skip_removed: bool
+    notification_skip_deleting: bool
+
+    send_start_message: bool
+    send_report_at_startup: bool
+
+    apprise_config: Tuple[str, ...]
+    ignore_namespace: Tuple[str, ...]
+
+    @classmethod
+    def load(cls, cl_config: Config, version=1):
+        """
+        Read every value with the Config getters
+        @param cl_config: config helper
+        @param version: incremented at every reload
+        """
+        return cls(version=version,
+                   loaded_at=time.time(),
+                   velero_namespace=cl_config.get_k8s_velero_namespace(),
+                   cluster_id=cl_config.k8s_cluster_identification(),
+                   schedule_enable=cl_config.velero_schedule_enable(),
+                   backup_enable=cl_config.velero_backup_enable(),
+                   expires_days_warning=cl_config.velero_expired_days_warning(),
+                   process_run_sec=cl_config.process_run_sec(),
+                   report_backup_item_prefix=cl_config.get_report_backup_item_prefix(),
+                   report_schedule_item_prefix=cl_config.get_report_schedule_item_prefix(),
+                   notification_skip_completed=cl_config.get_notification_skip_completed(),
+                   notification_skip_inprogress=cl_config.get_notification_skip_inprogress(),
+                   notification_skip_removed=cl_config.get_notification_skip_removed(),
+                   notification_skip_deleting=cl_config.get_notification_skip_deleting(),
+                   send_start_message=cl_config.send_start_message(),
+                   send_report_at_startup=cl_config.send_report_at_startup(),
+                   apprise_config=tuple(cl_config.get_apprise_config()),
+                   ignore_namespace=tuple(cl_config.get_regex_patterns_ignore_nm()))
+
+
+_snapshot: Optional[ConfigSnapshot] = None
+_lock = threading.Lock()
+
+
+def get_config_snapshot() -> ConfigSnapshot:
+    """
+    Current configuration snapshot, loaded at the first call
+    """
+    snapshot = _snapshot
+    if snapshot is None:
+        with _lock:
+            if _snapshot is None:
+                _swap(ConfigSnapshot.load(Config()))
+            snapshot = _snapshot
+    return snapshot
+
+
+def reload_config_snapshot() -> ConfigSnapshot:
+    """
+    Read the configuration again and replace the snapshot, the readers see the old or the new
+    snapshot and never a partial one
+    """
+    with _lock:
+        version = _snapshot.version + 1 if _snapshot is not None else 1
+        _swap(ConfigSnapshot.load(Config(), version=version))
+        return _snapshot
+
+
+def _swap(snapshot: ConfigSnapshot):
+    global _snapshot
+    _snapshot = snapshot
+    logger.info(f"ConfigSnapshot version={snapshot.version} loaded")
@@ -67,7 +67,7 @@ class Dispatcher:
                     logger.warning(f"dispatcher new receive element: item is None")
                     break
 
-                logger.debug(f"dispatcher new receive element: {item}")
+                logger.debug("dispatcher new receive element: %s", item)
                 # if len(item) < 20:
                 #     self.print_helper.debug(f"dispatcher new receive len(element)<20 item: {str(item)}")
                 #     break
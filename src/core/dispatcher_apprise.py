@@ -1,15 +1,34 @@
+import asyncio
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
 import apprise
+from apprise.url import URLBase
 
 from config.config import Config
 from config.config_dispatcher import ConfigDispatcher
 
+from core import report_renderer
+from core.notification_outbox import NotificationOutbox
+
 from utils.handle_error import handle_exceptions_async_method
+from utils import metrics
 from utils.logger import ColoredLogger, LEVEL_MAPPING
 import logging
 
 config_app = Config()
 logger = ColoredLogger.get_logger(__name__, level=LEVEL_MAPPING.get(config_app.get_internal_log_level(), logging.INFO))
 
+NOTIFICATION_TITLE = "Vui Watchdog"
+
+# a notify call performs a few requests, each one bounded by the socket timeouts of the service:
+# the call is abandoned only when it is blocked well beyond them
+NOTIFY_GUARD_FACTOR = 4
+
 
 class DispatcherApprise:
     """
@@ -19,19 +38,75 @@ class DispatcherApprise:
     def __init__(self,
                  queue=None,
                  dispatcher_config: ConfigDispatcher = None,
-                 test_configs=None
+                 test_configs=None,
+                 outbox: NotificationOutbox = None
                  ):
 
-        self.dispatcher_config = dispatcher_config
+        self.dispatcher_config = ConfigDispatcher()
+        if dispatcher_config is not None:
+            self.dispatcher_config = dispatcher_config
 
         self.queue = queue
         self.apobj = apprise.Apprise()
+        self.executor = None
+
+        # pending retries for every service url and messages dropped after the last attempt
+        self.retry_queues = {}
+        self.retry_tasks = {}
+        self.dead_letters = deque(maxlen=self.dispatcher_config.dead_letter_size)
+
+        # outbox message id -> service urls still waiting for the delivery
+        self.outbox = outbox
+        self.inflight = {}
+        # messages not acknowledged before the last stop, dispatched before the new ones
+        self.replay = [(message_id, report_renderer.loads_message(message))
+                       for message_id, message in outbox.pending()] if outbox is not None else []
+
+        # service url -> report format, the renderers of the formats are compiled with the config
+        self.formats = {}
 
         if not test_configs:
             self.load_config()
         else:
             # Adding configurations to the Apprise object
             self.apobj.add(test_configs)
+            self.__init_executor()
+            self.__set_timeouts()
+            self.__load_formats()
+
+    def __init_executor(self):
+        """
+        Two workers for every service: a new message and a retry can be sent at the same time
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        self.executor = ThreadPoolExecutor(max_workers=max(len(self.apobj), 1) * 2, thread_name_prefix='apprise')
+
+    def __set_timeouts(self):
+        """
+        The notification timeout is applied by the transport: a request that times out is closed by the
+        socket, a thread abandoned by the event loop would deliver the message later.
+        The cto / rto arguments of a service url win over the notification timeout
+        """
+        timeout = float(self.dispatcher_config.notification_timeout)
+        for service in self.apobj:
+            if service.socket_connect_timeout == URLBase.socket_connect_timeout:
+                service.socket_connect_timeout = timeout
+            if service.socket_read_timeout == URLBase.socket_read_timeout:
+                service.socket_read_timeout = timeout
+
+    def __load_formats(self):
+        self.formats = {service.url(): report_renderer.get_format(service) for service in self.apobj}
+        for name in set(self.formats.values()):
+            report_renderer.get_renderer(name)
+
+    def __render(self, message, service, cache=None):
+        """
+        Parts of the message in the format of the service that fit its body size limit
+        @param cache: dict format -> text shared by the services of a message
+        """
+        name = self.formats.get(service.url()) or report_renderer.get_format(service)
+        return report_renderer.render_parts(message, name, self.__get_max_len(service), cache)
 
     def load_config(self):
         notification_configs = self.dispatcher_config.apprise_configs
@@ -42,51 +117,248 @@ class DispatcherApprise:
             try:
                 self.apobj.add(config)
             except Exception as e:
-                print(f"Error in adding configuration '{config}': {e}")
+                logger.error(f"Error in adding configuration '{config}': {e}")
+        self.__init_executor()
+        self.__set_timeouts()
+        self.__load_formats()
+
+        # drop the retries of the services no longer configured
+        urls = {service.url() for service in self.apobj}
+        for url in list(self.retry_queues):
+            if url not in urls:
+                for item in self.retry_queues.pop(url):
+                    self.__resolve(item['id'], url)
 
     async def load_apprise_configs(self):
         self.load_config()
 
-    @handle_exceptions_async_method
-    async def send_msgs(self, message, test_message=False):
+    def __get_max_len(self, service):
+        """
+        Body size limit of a service: the smaller between the service limit and max_msg_len.
+        A service without a title field receives the title in the body
+        """
+        max_len = self.dispatcher_config.max_msg_len
+        if service.body_maxlen and service.body_maxlen > 0:
+            max_len = min(max_len, service.body_maxlen) if max_len > 0 else service.body_maxlen
+        if max_len > 0 and not service.title_maxlen:
+            max_len -= len(NOTIFICATION_TITLE) + 2
+        return max_len
+
+    async def __notify_service(self, service, parts, first_part=0):
+        """
+        Send the parts of a message to a single service, in order
+        @param service: apprise service
+        @param parts: message parts returned by __render
+        @param first_part: index of the first part to send, the previous ones are already delivered
+        @return: service url, True if all the parts are sent, index of the first part not sent
+        """
+        if len(parts) > 1:
+            logger.info(f"Message split in {len(parts)} parts for {service.url(privacy=True)}")
+        for index in range(first_part, len(parts)):
+            # a part with an unknown result is not sent again: the service may have received it
+            if await self.__notify_part(service, parts[index]) is False:
+                return service.url(), False, index
+        return service.url(), True, len(parts)
+
+    async def __notify_part(self, service, message):
         """
-        Send message
+        Send a message part to a single service in the worker pool
+        @param service: apprise service
         @param message: body message
+        @return: True if the notification is sent, False if it failed, None if the result is unknown
+        """
+        success = False
+        result = 'failure'
+        # the worker thread cannot be cancelled: wait_for only stops waiting for a plugin blocked
+        # beyond its socket timeouts
+        guard = max(service.socket_connect_timeout + service.socket_read_timeout,
+                    self.dispatcher_config.notification_timeout) * NOTIFY_GUARD_FACTOR
+        try:
+            logger.info(f"Try sent message to {service}")
+            event_loop = asyncio.get_running_loop()
+            success = await asyncio.wait_for(event_loop.run_in_executor(self.executor,
+                                                                        partial(service.notify,
+                                                                                body=message,
+                                                                                title=NOTIFICATION_TITLE)),
+                                             timeout=guard)
+            if success:
+                result = 'success'
+                logger.info(f"Notification sent with success: {service.url()}")
+            else:
+                logger.error(f"Error in sending notification: {service.url()}")
+        except asyncio.TimeoutError:
+            success = None
+            result = 'timeout'
+            logger.error(f"Timeout in sending notification {service.url()}: no answer in {guard} seconds, "
+                         f"the delivery is unknown and the part is not sent again")
+        except Exception as e:
+            logger.error(f"Error in sending notification {service.url()}: {str(e)}")
+
+        metrics.notifications.inc(service.url(privacy=True), result)
+        return success
+
+    def __ack(self, message_id):
+        if self.outbox is not None and message_id is not None:
+            self.outbox.ack(message_id)
+
+    def __resolve(self, message_id, url):
+        """
+        A service has completed the delivery of a message (sent or dropped): when no service is
+        waiting anymore, the message is acknowledged in the outbox
+        """
+        if message_id is None or message_id not in self.inflight:
+            return
+        self.inflight[message_id].discard(url)
+        if len(self.inflight[message_id]) == 0:
+            del self.inflight[message_id]
+            self.__ack(message_id)
+
+    @handle_exceptions_async_method
+    async def send_msgs(self, message, test_message=False, message_id=None):
+        """
+        Send message to all services concurrently
+        @param message: report model or text message
         @param test_message: bool true if test message, false otherwise
+        @param message_id: outbox id of the message, acknowledged when every service has completed
+        @return: dict service url -> True if the notification is sent, bool for a test message
         """
+        results = {}
         try:
             if len(self.apobj) == 0:
                 logger.error("No APPRISE config found")
-            # Iteration on services to send notifications individually and catch errors.
-            for service in self.apobj:
-                success = False
-                try:
-                    logger.info(f"Try sent message to {service}")
-                    # Send notification
-                    success = service.notify(
-                        body=message,
-                        title="Vui Watchdog",
-                    )
-                    if success:
-                        logger.info(f"Notification sent with success: {service.url()}")
-
-                    else:
-                        logger.error(f"Error in sending notification: {service.url()}")
-                except Exception as e:
-                    logger.error(f"Error in sending notification {service.url()}: {str(e)}")
-                finally:
-                    if test_message:
-                        return success
+
+            # the model is rendered once for every format
+            rendered = {}
+            sent = await asyncio.gather(*[self.__notify_service(service, self.__render(message, service, rendered))
+                                          for service in self.apobj])
+            results = {url: success for url, success, _ in sent}
+
+            if not test_message:
+                failed = [(url, part) for url, success, part in sent if not success]
+                if len(failed) > 0 and message_id is not None:
+                    self.inflight[message_id] = {url for url, _ in failed}
+                else:
+                    self.__ack(message_id)
+                for url, part in failed:
+                    self.__schedule_retry(url, message, message_id, part)
 
         except Exception as err:
             logger.error(f"Error APPRISE sending notification {str(err)}")
 
+        if test_message:
+            return len(results) > 0 and all(results.values())
+        return results
+
+    def __retry_delay(self, attempt):
+        """
+        Exponential backoff with jitter: a random value between half and the full delay
+        @param attempt: number of failed attempts
+        """
+        delay = min(self.dispatcher_config.retry_base_seconds * (2 ** (attempt - 1)),
+                    self.dispatcher_config.retry_max_seconds)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def __schedule_retry(self, url, message, message_id=None, part=0):
+        """
+        Add a failed message to the retry queue of the service
+        @param part: index of the first part not delivered, the retries start from it
+        """
+        if self.dispatcher_config.retry_max_attempts <= 1:
+            self.__add_dead_letter(url, message, 1)
+            self.__resolve(message_id, url)
+            return
+
+        pending = self.retry_queues.setdefault(url, deque())
+        pending.append({'id': message_id,
+                        'message': message,
+                        'part': part,
+                        'attempt': 1,
+                        'next_try': time.monotonic() + self.__retry_delay(1)})
+        logger.info(f"Notification to {url} scheduled for retry, pending {len(pending)}")
+
+    def __add_dead_letter(self, url, message, attempts):
+        service = self.__get_service(url)
+        self.dead_letters.append({'service': service.url(privacy=True) if service is not None else url,
+                                  'message': message,
+                                  'attempts': attempts,
+                                  'last_attempt': datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")})
+        logger.error(f"Notification to {url} dropped after {attempts} attempts")
+        metrics.notifications_dead_letter.inc(self.dead_letters[-1]['service'])
+
+    def __get_service(self, url):
+        return next((service for service in self.apobj if service.url() == url), None)
+
+    async def __retry_service(self, url):
+        """
+        Retry the oldest pending message of a service: one retry at a time for every service keeps the order
+        """
+        try:
+            pending = self.retry_queues.get(url)
+            service = self.__get_service(url)
+            if not pending or service is None:
+                return
+
+            item = pending[0]
+            _, success, item['part'] = await self.__notify_service(service,
+                                                                   self.__render(item['message'], service),
+                                                                   item['part'])
+
+            # the queue may have been dropped by a config reload
+            if self.retry_queues.get(url) is not pending:
+                return
+
+            if success:
+                pending.popleft()
+                self.__resolve(item['id'], url)
+            else:
+                item['attempt'] += 1
+                if item['attempt'] >= self.dispatcher_config.retry_max_attempts:
+                    pending.popleft()
+                    self.__add_dead_letter(url, item['message'], item['attempt'])
+                    self.__resolve(item['id'], url)
+                else:
+                    item['next_try'] = time.monotonic() + self.__retry_delay(item['attempt'])
+
+            if len(pending) == 0:
+                del self.retry_queues[url]
+        finally:
+            self.retry_tasks.pop(url, None)
+
+    async def __retry_loop(self):
+        """
+        Start the retry of the services with a message due, without waiting for the other services
+        """
+        while True:
+            await asyncio.sleep(1)
+            if self.outbox is not None:
+                self.outbox.flush()
+            now = time.monotonic()
+            for url, pending in list(self.retry_queues.items()):
+                if url not in self.retry_tasks and len(pending) > 0 and pending[0]['next_try'] <= now:
+                    self.retry_tasks[url] = asyncio.create_task(self.__retry_service(url))
+
+    def get_dead_letters(self):
+        """
+        Messages not delivered after the max number of attempts
+        """
+        return list(self.dead_letters)
+
     @handle_exceptions_async_method
     async def run(self, loop=True):
         """
         Main loop
         """
+        retry_task = None
         try:
+            if loop:
+                retry_task = asyncio.create_task(self.__retry_loop())
+
+            # messages left in the outbox by the previous run
+            replay = self.replay
+            self.replay = []
+            for message_id, message in replay:
+                logger.info(f"APPRISE dispatcher: dispatch message {message_id} from outbox")
+                await self.send_msgs(message, message_id=message_id)
 
             flag = True
             while flag:
@@ -99,13 +371,22 @@ class DispatcherApprise:
                     break
 
                 logger.info("APPRISE dispatcher: new element received")
-                logger.debug(f"APPRISE dispatcher: new element received"
+                logger.debug("APPRISE dispatcher: new element received"
                              "\n--------------------------------------------------------------------------------------"
-                             f"\n{str(item)}"
-                             f"\n-------------------------------------------------------------------------------------")
+                             "\n%s"
+                             "\n-------------------------------------------------------------------------------------",
+                             item['message'])
+
+                if len(item['message']) > 0:
+                    await self.send_msgs(item['message'], message_id=item['id'])
+                else:
+                    self.__ack(item['id'])
 
-                if item is not None and len(item) > 0:
-                    await self.send_msgs(item)
+                if self.outbox is not None:
+                    self.outbox.flush()
 
         except Exception as err:
             logger.error(f"run {str(err)}")
+        finally:
+            if retry_task is not None:
+                retry_task.cancel()
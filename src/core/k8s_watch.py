@@ -0,0 +1,82 @@
+from kubernetes import client, watch
+
+from config.config import Config
+
+from utils.logger import ColoredLogger, LEVEL_MAPPING
+import logging
+
+config_app = Config()
+logger = ColoredLogger.get_logger(__name__, level=LEVEL_MAPPING.get(config_app.get_internal_log_level(), logging.INFO))
+
+HTTP_STATUS_GONE = 410
+RETRY_MAX_SECONDS = 60
+# the watch read timeout is longer than the server side timeout_seconds
+WATCH_TIMEOUT_MARGIN_SECONDS = 15
+
+
+def watch_request_timeout(timeout_seconds, request_timeout=None):
+    """
+    Client timeout of a watch request: a connection dropped without a FIN would block the
+    watch thread forever without a read timeout
+    @param timeout_seconds: server side timeout of the watch
+    @param request_timeout: connect timeout
+    @return: (connect, read) timeout
+    """
+    return request_timeout, timeout_seconds + WATCH_TIMEOUT_MARGIN_SECONDS
+
+
+def run_watch_loop(label,
+                   stop_request,
+                   stream,
+                   on_event,
+                   relist=None,
+                   resync_request=None,
+                   on_watcher=None):
+    """
+    List + watch cycle shared by the informers and the user config watcher, run in a dedicated thread.
+    A full list is performed at startup, when the resourceVersion is too old (410 Gone), after an error
+    and when a resync is requested; afterward only change events are received. The errors are retried
+    with an exponential backoff.
+    @param label: name used in the logs
+    @param stop_request: threading.Event that ends the loop
+    @param stream: function(watcher, resource_version) returning the watcher.stream iterator
+    @param on_event: function called for every event except the bookmarks
+    @param relist: function performing a full list and returning its resourceVersion, None to watch only
+    @param resync_request: threading.Event requesting a full list
+    @param on_watcher: function called with every new watch.Watch, e.g. to stop it from another thread
+    """
+    resource_version = None
+    retry_seconds = 1
+    while not stop_request.is_set():
+        try:
+            resync = resync_request is not None and resync_request.is_set()
+            if relist is not None and (resource_version is None or resync):
+                if resync_request is not None:
+                    resync_request.clear()
+                resource_version = relist()
+
+            watcher = watch.Watch()
+            if on_watcher is not None:
+                on_watcher(watcher)
+            for event in stream(watcher, resource_version):
+                if event['type'] == 'BOOKMARK':
+                    resource_version = event['raw_object']['metadata']['resourceVersion']
+                    continue
+                on_event(event)
+                resource_version = event['raw_object'].get('metadata', {}).get('resourceVersion', resource_version)
+            retry_seconds = 1
+
+        except client.exceptions.ApiException as e:
+            resource_version = None
+            if e.status == HTTP_STATUS_GONE:
+                logger.info(f"{label}: resource version expired, re-listing")
+            else:
+                logger.error(f"{label}: watch error {str(e)}")
+                stop_request.wait(retry_seconds)
+                retry_seconds = min(retry_seconds * 2, RETRY_MAX_SECONDS)
+
+        except Exception as e:
+            logger.error(f"{label}: {str(e)}")
+            resource_version = None
+            stop_request.wait(retry_seconds)
+            retry_seconds = min(retry_seconds * 2, RETRY_MAX_SECONDS)
@@ -1,11 +1,14 @@
 import asyncio
+import time
 
 from config.config import Config
 from config.config_k8s_process import ConfigK8sProcess
+from config.config_snapshot import get_config_snapshot
 
 from core.velero_status import VeleroStatus
 
 from utils.handle_error import handle_exceptions_async_method
+from utils import metrics
 
 from utils.logger import ColoredLogger, LEVEL_MAPPING
 import logging
@@ -30,6 +33,15 @@ class KubernetesStatusRun:
         self.cycle_seconds = cycles_seconds
         self.loop = 0
 
+        # seconds to wait after a change event to collect a burst of events in one cycle
+        self.debounce_seconds = 2
+        self.changed = asyncio.Event()
+
+        # last snapshot sent to the checker, used by the on demand reports
+        self.last_snapshot = None
+        self.last_snapshot_time = None
+        self.refresh_task = None
+
         self.velero_stat = VeleroStatus(k8s_key_config)
 
         self.k8s_config = ConfigK8sProcess()
@@ -46,6 +58,44 @@ class KubernetesStatusRun:
 
         await self.queue.put(obj)
 
+    async def __read_snapshot(self):
+        data_res = {self.k8s_config.cluster_name_key: self.k8s_config.cluster_id}
+        start = time.perf_counter()
+        snapshot = await self.velero_stat.get_k8s_snapshot_async(namespace=get_config_snapshot().velero_namespace)
+        metrics.cycle_duration.observe(time.perf_counter() - start)
+        data_res.update(snapshot)
+
+        self.last_snapshot = data_res
+        self.last_snapshot_time = time.time()
+        return data_res
+
+    async def refresh(self):
+        """
+        Read a new snapshot. The concurrent callers share the same api server read
+        """
+        if self.refresh_task is None or self.refresh_task.done():
+            self.refresh_task = asyncio.ensure_future(self.__read_snapshot())
+        return await asyncio.shield(self.refresh_task)
+
+    async def get_snapshot(self, refresh=False):
+        """
+        Last snapshot of the daemon, read now if it is requested or if no cycle is completed yet
+        """
+        if refresh or self.last_snapshot is None:
+            return await self.refresh()
+        return self.last_snapshot
+
+    async def __wait_for_changes(self):
+        """
+        Wait for a change event from the informer. The cycle seconds are used as resync period
+        """
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout=self.cycle_seconds)
+            await asyncio.sleep(self.debounce_seconds)
+        except asyncio.TimeoutError:
+            logger.debug(f"Kubernetes status: no changes in {self.cycle_seconds} seconds, resync")
+        self.changed.clear()
+
     @handle_exceptions_async_method
     async def run(self, loop=True):
         """
@@ -57,36 +107,23 @@ class KubernetesStatusRun:
         # add wait
         await asyncio.sleep(2)
 
-        cluster_name = self.k8s_config.cluster_id
+        watch_mode = loop and self.k8s_config.watch_enable
+        if watch_mode:
+            logger.info(f"Kubernetes status: watch mode enabled")
+            self.velero_stat.start_watch(asyncio.get_running_loop(), self.changed)
 
         flag = True
         while flag:
             flag = loop
             try:
                 logger.debug(f"Kubernetes status cycle in seconds every {self.cycle_seconds}")
-                data_res = {self.k8s_config.cluster_name_key: cluster_name}
-
-                if self.k8s_config.schedule_enable:
-                    schedule_list = self.velero_stat.get_k8s_velero_schedules(
-                        namespace=config_app.get_k8s_velero_namespace())
-                    data_res[self.k8s_config.schedules_key] = schedule_list
-
-                if self.k8s_config.backup_enable:
-                    last_backups_list = self.velero_stat.get_k8s_last_backups(
-                        namespace=config_app.get_k8s_velero_namespace())
-                    data_res[self.k8s_config.backups_key] = last_backups_list[self.k8s_config.backups_key]
-
-                    unscheduled_namespace = self.velero_stat.get_unscheduled_namespaces()  # (
-                    # namespace=config_app.get_k8s_velero_namespace())
-                    data_res[self.k8s_config.unschedule_namespace_key] = unscheduled_namespace[
-                        self.k8s_config.unschedule_namespace_key]
-
-                    all_backups = self.velero_stat.get_k8s_all_backups(namespace=config_app.get_k8s_velero_namespace())
-                    data_res[self.k8s_config.all_backups_key] = all_backups[self.k8s_config.all_backups_key]
+                data_res = await self.refresh()
 
                 await self.__put_in_queue(data_res)
 
-                if loop:
+                if watch_mode:
+                    await self.__wait_for_changes()
+                elif loop:
                     await asyncio.sleep(self.cycle_seconds)
 
             except Exception as e:
@@ -0,0 +1,186 @@
+import threading
+
+GLOB_CHARS = ('*', '?', '[')
+
+
+class NamespaceCoverage:
+    """
+    Index namespace -> schedules that include it in their backups.
+    Namespaces and schedules are applied incrementally: a changed namespace is checked only against the
+    schedules that can include it, a changed schedule only against the namespaces it can include.
+    The schedules listing namespace names are indexed by name, the ones with '*', an empty list, glob
+    patterns are checked against every namespace.
+    """
+
+    def __init__(self):
+        self.namespaces = {}  # name -> labels
+        self.schedules = {}  # name -> ScheduleRecord
+        self.covering = {}  # namespace -> set of schedule names
+        self.covered = {}  # schedule name -> set of namespaces
+        self.by_name = {}  # namespace name -> schedules that list it in includedNamespaces
+        self.generic = set()  # schedules that can include any namespace
+        self.unscheduled = set()
+
+        self.sorted_unscheduled = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def __listed_names(schedule):
+        """
+        Namespace names of includedNamespaces, None if the schedule can include any namespace
+        """
+        if len(schedule.included_namespaces) == 0:
+            return None
+        for name in schedule.included_namespaces:
+            if any(char in name for char in GLOB_CHARS):
+                return None
+        return schedule.included_namespaces
+
+    def __link(self, namespace, schedule_name):
+        covering = self.covering[namespace]
+        covering.add(schedule_name)
+        self.covered[schedule_name].add(namespace)
+        if len(covering) == 1:
+            self.unscheduled.discard(namespace)
+            self.sorted_unscheduled = None
+
+    def __unlink(self, namespace, schedule_name):
+        covering = self.covering[namespace]
+        covering.discard(schedule_name)
+        self.covered[schedule_name].discard(namespace)
+        if len(covering) == 0:
+            self.unscheduled.add(namespace)
+            self.sorted_unscheduled = None
+
+    def __unindex_schedule(self, schedule):
+        names = self.__listed_names(schedule)
+        if names is None:
+            self.generic.discard(schedule.name)
+            return
+        for name in names:
+            listed = self.by_name.get(name)
+            if listed is not None:
+                listed.discard(schedule.name)
+                if len(listed) == 0:
+                    del self.by_name[name]
+
+    def __index_schedule(self, schedule):
+        names = self.__listed_names(schedule)
+        if names is None:
+            self.generic.add(schedule.name)
+            return None
+        for name in names:
+            self.by_name.setdefault(name, set()).add(schedule.name)
+        return names
+
+    def __set_namespace(self, name, labels):
+        labels = labels or {}
+        if name in self.namespaces and self.namespaces[name] == labels:
+            return
+        self.namespaces[name] = labels
+        if name not in self.covering:
+            self.covering[name] = set()
+            self.unscheduled.add(name)
+            self.sorted_unscheduled = None
+
+        candidates = self.generic | self.by_name.get(name, set())
+        covering = {schedule_name for schedule_name in candidates
+                    if self.schedules[schedule_name].covers_namespace(name)}
+        for schedule_name in self.covering[name] - covering:
+            self.__unlink(name, schedule_name)
+        for schedule_name in covering - self.covering[name]:
+            self.__link(name, schedule_name)
+
+    def __remove_namespace(self, name):
+        if name not in self.namespaces:
+            return
+        del self.namespaces[name]
+        for schedule_name in self.covering.pop(name):
+            self.covered[schedule_name].discard(name)
+        if name in self.unscheduled:
+            self.unscheduled.discard(name)
+            self.sorted_unscheduled = None
+
+    def __set_schedule(self, schedule):
+        current = self.schedules.get(schedule.name)
+        if current is not None:
+            if current.fingerprint == schedule.fingerprint:
+                return
+            self.__unindex_schedule(current)
+        self.schedules[schedule.name] = schedule
+        self.covered.setdefault(schedule.name, set())
+
+        names = self.__index_schedule(schedule)
+        candidates = self.namespaces.keys() if names is None else \
+            [name for name in names if name in self.namespaces]
+        covered = {namespace for namespace in candidates
+                   if schedule.covers_namespace(namespace)}
+        for namespace in self.covered[schedule.name] - covered:
+            self.__unlink(namespace, schedule.name)
+        for namespace in covered - self.covered[schedule.name]:
+            self.__link(namespace, schedule.name)
+
+    def __remove_schedule(self, name):
+        schedule = self.schedules.pop(name, None)
+        if schedule is None:
+            return
+        self.__unindex_schedule(schedule)
+        for namespace in list(self.covered[name]):
+            self.__unlink(namespace, name)
+        del self.covered[name]
+
+    def set_namespace(self, name, labels=None):
+        """
+        Add or update a namespace
+        """
+        with self.lock:
+            self.__set_namespace(name, labels)
+
+    def remove_namespace(self, name):
+        with self.lock:
+            self.__remove_namespace(name)
+
+    def set_schedule(self, schedule):
+        """
+        Add or update a schedule
+        @param schedule: ScheduleRecord
+        """
+        with self.lock:
+            self.__set_schedule(schedule)
+
+    def remove_schedule(self, name):
+        with self.lock:
+            self.__remove_schedule(name)
+
+    def sync_namespaces(self, namespaces):
+        """
+        Align the index to a full namespace list, only the differences are applied.
+        The lock is held for the whole sync: the informer thread and the api workers can sync at the same time
+        @param namespaces: name -> labels
+        """
+        with self.lock:
+            for name in [name for name in self.namespaces if name not in namespaces]:
+                self.__remove_namespace(name)
+            for name, labels in namespaces.items():
+                self.__set_namespace(name, labels)
+
+    def sync_schedules(self, schedules):
+        """
+        Align the index to a full schedule map, only the differences are applied
+        @param schedules: name -> ScheduleRecord
+        """
+        with self.lock:
+            for name in [name for name in self.schedules if name not in schedules]:
+                self.__remove_schedule(name)
+            for schedule in schedules.values():
+                self.__set_schedule(schedule)
+
+    def get_unscheduled(self):
+        """
+        Namespaces not included by any schedule
+        @return: sorted names and the total number of namespaces
+        """
+        with self.lock:
+            if self.sorted_unscheduled is None:
+                self.sorted_unscheduled = sorted(self.unscheduled)
+            return self.sorted_unscheduled, len(self.namespaces)
@@ -0,0 +1,137 @@
+import threading
+
+from kubernetes import client
+
+from config.config import Config
+
+from core.k8s_watch import run_watch_loop, watch_request_timeout
+
+from utils import metrics
+from utils.logger import ColoredLogger, LEVEL_MAPPING
+import logging
+
+config_app = Config()
+logger = ColoredLogger.get_logger(__name__, level=LEVEL_MAPPING.get(config_app.get_internal_log_level(), logging.INFO))
+
+# metadata only list, a full list is returned by an api server that does not support it
+NAMESPACE_METADATA_ACCEPT = 'application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json'
+
+
+def list_namespace_metadata(core_api: client.CoreV1Api, page_size=500, request_timeout=None):
+    """
+    Namespaces read as PartialObjectMetadataList: the api server sends only the metadata and
+    the response is not deserialized in V1Namespace models
+    @return: name -> labels and the resourceVersion of the list
+    """
+    namespaces = {}
+    resource_version = None
+    continue_token = None
+    while True:
+        query_params = [('limit', page_size)]
+        if continue_token:
+            query_params.append(('continue', continue_token))
+        with metrics.api_request_duration.time('namespaces'):
+            response = core_api.api_client.call_api('/api/v1/namespaces', 'GET',
+                                                    query_params=query_params,
+                                                    header_params={'Accept': NAMESPACE_METADATA_ACCEPT},
+                                                    auth_settings=['BearerToken'],
+                                                    response_type='object',
+                                                    _return_http_data_only=True,
+                                                    _request_timeout=request_timeout)
+        for item in response.get('items', []):
+            metadata = item['metadata']
+            namespaces[metadata['name']] = metadata.get('labels') or {}
+
+        resource_version = response.get('metadata', {}).get('resourceVersion', resource_version)
+        continue_token = response.get('metadata', {}).get('continue')
+        if not continue_token:
+            break
+    return namespaces, resource_version
+
+
+class NamespaceInformer:
+    """
+    Keep the namespaces of a NamespaceCoverage index updated with a list + watch cycle.
+    The namespaces rejected by the accept function (ignored namespaces) are not indexed.
+    """
+
+    def __init__(self,
+                 core_api: client.CoreV1Api,
+                 coverage,
+                 accept=None,
+                 timeout_seconds=300,
+                 page_size=500,
+                 request_timeout=None):
+
+        self.core_api = core_api
+        self.coverage = coverage
+        self.accept = accept or (lambda name: True)
+        self.timeout_seconds = timeout_seconds
+        self.page_size = page_size
+        self.request_timeout = request_timeout
+
+        self.synced = threading.Event()
+        self.thread = None
+        self.watcher = None
+        self.stop_request = threading.Event()
+        self.resync_request = threading.Event()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.__watch_loop, name="namespace-informer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_request.set()
+        if self.watcher is not None:
+            self.watcher.stop()
+
+    def resync(self):
+        """
+        Request a full list, e.g. when the accept function changes
+        """
+        self.resync_request.set()
+        if self.watcher is not None:
+            self.watcher.stop()
+
+    def has_synced(self):
+        return self.synced.is_set()
+
+    def __relist(self):
+        namespaces, resource_version = list_namespace_metadata(self.core_api,
+                                                               page_size=self.page_size,
+                                                               request_timeout=self.request_timeout)
+        self.coverage.sync_namespaces({name: labels for name, labels in namespaces.items() if self.accept(name)})
+        self.synced.set()
+        logger.info(f"Informer namespaces: listed {len(namespaces)} items")
+        return resource_version
+
+    def __apply_event(self, event):
+        metadata = event['raw_object'].get('metadata', {})
+        name = metadata.get('name')
+        if name is None:
+            return
+        if event['type'] == 'DELETED' or not self.accept(name):
+            self.coverage.remove_namespace(name)
+        else:
+            self.coverage.set_namespace(name, metadata.get('labels') or {})
+        logger.debug("Informer namespaces: %s %s", event['type'], name)
+
+    def __set_watcher(self, watcher):
+        self.watcher = watcher
+
+    def __watch_loop(self):
+        def stream(watcher, resource_version):
+            return watcher.stream(self.core_api.list_namespace,
+                                  resource_version=resource_version,
+                                  timeout_seconds=self.timeout_seconds,
+                                  allow_watch_bookmarks=True,
+                                  _request_timeout=watch_request_timeout(self.timeout_seconds,
+                                                                         self.request_timeout))
+
+        run_watch_loop("Informer namespaces",
+                       self.stop_request,
+                       stream,
+                       self.__apply_event,
+                       relist=self.__relist,
+                       resync_request=self.resync_request,
+                       on_watcher=self.__set_watcher)
@@ -0,0 +1,92 @@
+import os
+import sqlite3
+
+from config.config import Config
+
+from utils.logger import ColoredLogger, LEVEL_MAPPING
+import logging
+
+config_app = Config()
+logger = ColoredLogger.get_logger(__name__, level=LEVEL_MAPPING.get(config_app.get_internal_log_level(), logging.INFO))
+
+
+class NotificationOutbox:
+    """
+    SQLite outbox of the messages waiting to be dispatched.
+    A message is appended before it is queued and removed only when it is acknowledged, the messages
+    left in the file are dispatched again at startup (at-least-once delivery across restarts).
+    The database runs in WAL mode with synchronous=NORMAL: the commits are grouped in the WAL file and
+    synced to disk only at checkpoint time.
+    """
+
+    def __init__(self, path, compact_every=500):
+        self.path = path
+        self.compact_every = compact_every
+
+        self.acked = []
+        self.removed_since_compact = 0
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS outbox ("
+                        "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                        "created_at TEXT DEFAULT CURRENT_TIMESTAMP, "
+                        "message TEXT NOT NULL)")
+        self.db.commit()
+        self.compact()
+
+    def append(self, message):
+        """
+        Store a new message
+        @param message: message to dispatch
+        @return: id of the message, used to acknowledge it
+        """
+        with self.db:
+            cursor = self.db.execute("INSERT INTO outbox (message) VALUES (?)", (message,))
+        return cursor.lastrowid
+
+    def pending(self):
+        """
+        Messages not yet acknowledged, in insertion order
+        """
+        self.flush()
+        return self.db.execute("SELECT id, message FROM outbox ORDER BY id").fetchall()
+
+    def ack(self, message_id):
+        """
+        Mark a message as delivered, the removal is committed by the next flush
+        """
+        if message_id is not None:
+            self.acked.append(message_id)
+
+    def flush(self):
+        """
+        Remove all the acknowledged messages in a single transaction
+        """
+        if len(self.acked) == 0:
+            return
+
+        acked = self.acked
+        self.acked = []
+        with self.db:
+            self.db.executemany("DELETE FROM outbox WHERE id = ?", [(message_id,) for message_id in acked])
+
+        self.removed_since_compact += len(acked)
+        if self.removed_since_compact >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """
+        Reclaim the space of the removed messages and truncate the WAL file
+        """
+        try:
+            self.db.execute("VACUUM")
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.removed_since_compact = 0
+        except sqlite3.Error as e:
+            logger.error(f"Outbox compaction failed: {str(e)}")
@@ -0,0 +1,362 @@
+import html
+import json
+from string import Formatter
+
+from utils.message_split import split_lines, split_message, split_numbered
+
+# version of the report model stored in the outbox
+REPORT_KEY = 'report'
+REPORT_VERSION = 1
+
+TEXT = 'text'
+MARKDOWN = 'markdown'
+SLACK = 'slack'
+HTML = 'html'
+
+# html tables are sent only to the email services, the other html services (e.g. telegram) support a few tags
+HTML_TABLE_PROTOCOLS = {'mailto', 'mailtos'}
+
+#
+# report model: plain dicts and lists, stored as JSON in the outbox
+#
+
+
+def report(cluster, blocks):
+    return {REPORT_KEY: REPORT_VERSION, 'cluster': cluster, 'blocks': blocks}
+
+
+def title(text, subtitle=None):
+    return {'type': 'title', 'text': text, 'subtitle': subtitle}
+
+
+def section(section_title, entries):
+    """
+    @param section_title: title or None
+    @param entries: list of entry
+    """
+    return {'type': 'section', 'title': section_title, 'entries': entries}
+
+
+def entry(label, value, items=None, note=''):
+    return {'label': label, 'value': value, 'items': items or [], 'note': note}
+
+
+def events(items):
+    """
+    @param items: list of event
+    """
+    return {'type': 'events', 'items': items}
+
+
+def event(text, details=None):
+    return {'text': text, 'details': details or []}
+
+
+def item_list(list_title, items):
+    return {'type': 'list', 'title': list_title, 'items': items}
+
+
+def dumps_message(message):
+    return json.dumps(message)
+
+
+def loads_message(text):
+    """
+    Report model read from the outbox
+    """
+    return json.loads(text)
+
+
+#
+# templates
+#
+
+class _Template:
+    """
+    Template in str.format syntax parsed once: rendering joins the literals and the fields
+    """
+    __slots__ = ('parts', 'prefix', 'suffix', 'field')
+
+    def __init__(self, template):
+        self.parts = tuple((literal, field) for literal, field, _, _ in Formatter().parse(template))
+        fields = [field for _, field in self.parts if field is not None]
+
+        # a template with a single field repeated for every item of a list is rendered with a join
+        self.field = fields[0] if len(fields) == 1 else None
+        self.prefix = ''
+        self.suffix = ''
+        if self.field is not None:
+            index = next(i for i, (_, field) in enumerate(self.parts) if field is not None)
+            self.prefix = ''.join(literal for literal, _ in self.parts[:index + 1])
+            self.suffix = ''.join(literal for literal, _ in self.parts[index + 1:])
+
+    def render(self, escape, **values):
+        return ''.join([f"{literal}{escape(values[field]) if field is not None else ''}"
+                        for literal, field in self.parts])
+
+    def render_all(self, escape, items):
+        """
+        Render the single field template for every item
+        """
+        if len(items) == 0:
+            return ''
+        separator = f'{self.suffix}{self.prefix}'
+        return f'{self.prefix}{separator.join([escape(item) for item in items])}{self.suffix}'
+
+
+_TEMPLATE_KEYS = ('cluster', 'title', 'subtitle', 'separator',
+                  'section_title', 'section_start', 'section_end', 'entry', 'entry_items_start', 'entry_item',
+                  'entry_items_end', 'events_start', 'event', 'event_detail', 'event_end', 'event_separator',
+                  'events_end', 'list_title', 'list_start', 'list_item', 'list_end')
+
+TEMPLATES = {
+    TEXT: {'cluster': 'Cluster: {cluster}\n',
+           'title': '{text}',
+           'subtitle': '\n{text}',
+           'separator': '\n',
+           'section_title': '\n{title}:',
+           'entry': '\n    • {label}={value}{note}',
+           'entry_item': '\n        ‣ {item}',
+           'event': '{text}',
+           'event_detail': '\n{detail}',
+           'event_separator': '\n',
+           'list_title': '\n{title}:',
+           'list_item': '\n        ‣ {item}'},
+    MARKDOWN: {'cluster': '**Cluster:** {cluster}\n\n',
+               'title': '### {text}',
+               'subtitle': '\n{text}',
+               'separator': '\n',
+               'section_title': '\n**{title}**\n',
+               'entry': '\n- {label}: {value}{note}',
+               'entry_item': '\n    - `{item}`',
+               'event': '- {text}',
+               'event_detail': '\n    - {detail}',
+               'event_separator': '\n',
+               'list_title': '\n**{title}**\n',
+               'list_item': '\n- `{item}`'},
+    SLACK: {'cluster': '*Cluster:* {cluster}\n\n',
+            'title': '*{text}*',
+            'subtitle': '\n{text}',
+            'separator': '\n',
+            'section_title': '\n*{title}*',
+            'entry': '\n• {label}: {value}{note}',
+            'entry_item': '\n        ‣ `{item}`',
+            'event': '• {text}',
+            'event_detail': '\n        ‣ {detail}',
+            'event_separator': '\n',
+            'list_title': '\n*{title}*',
+            'list_item': '\n        ‣ `{item}`'},
+    HTML: {'cluster': '<p><b>Cluster:</b> {cluster}</p>\n',
+           'title': '<h3>{text}</h3>',
+           'subtitle': '\n<p>{text}</p>',
+           'separator': '\n',
+           'section_title': '\n<h4>{title}</h4>',
+           'section_start': '\n<table>',
+           'section_end': '\n</table>',
+           'entry': '\n<tr><td>{label}</td><td><b>{value}</b>{note}</td></tr>',
+           'entry_items_start': '\n<tr><td></td><td><ul>',
+           'entry_item': '\n<li>{item}</li>',
+           'entry_items_end': '\n</ul></td></tr>',
+           'events_start': '<ul>',
+           'event': '\n<li>{text}',
+           'event_detail': '<br>{detail}',
+           'event_end': '</li>',
+           'events_end': '\n</ul>',
+           'list_title': '\n<h4>{title}</h4>',
+           'list_start': '\n<ul>',
+           'list_item': '\n<li>{item}</li>',
+           'list_end': '\n</ul>'},
+}
+
+ESCAPES = {HTML: lambda value: html.escape(str(value))}
+
+# key of the items of the blocks that can be split in smaller blocks of the same type
+_BLOCK_ITEMS = {'section': 'entries', 'events': 'items', 'list': 'items'}
+
+
+class ReportRenderer:
+    """
+    Render the report model in a format with its templates, compiled when the renderer is created
+    """
+
+    def __init__(self, templates, escape=None):
+        self.escape = escape or str
+        self.templates = {key: _Template(templates.get(key, '')) for key in _TEMPLATE_KEYS}
+
+    def __block(self, block):
+        t = self.templates
+        escape = self.escape
+        kind = block['type']
+        if kind == 'title':
+            text = t['title'].render(escape, text=block['text'])
+            if block.get('subtitle'):
+                text += t['subtitle'].render(escape, text=block['subtitle'])
+            return text
+
+        if kind == 'section':
+            parts = []
+            if block['title']:
+                parts.append(t['section_title'].render(escape, title=block['title']))
+            parts.append(t['section_start'].render(escape))
+            for item in block['entries']:
+                parts.append(t['entry'].render(escape, label=item['label'], value=item['value'], note=item['note']))
+                if len(item['items']) > 0:
+                    parts.append(t['entry_items_start'].render(escape))
+                    parts.append(t['entry_item'].render_all(escape, item['items']))
+                    parts.append(t['entry_items_end'].render(escape))
+            parts.append(t['section_end'].render(escape))
+            return ''.join(parts)
+
+        if kind == 'events':
+            rendered = [t['event'].render(escape, text=item['text']) +
+                        t['event_detail'].render_all(escape, item['details']) +
+                        t['event_end'].render(escape)
+                        for item in block['items']]
+            return f"{t['events_start'].render(escape)}" \
+                   f"{t['event_separator'].render(escape).join(rendered)}" \
+                   f"{t['events_end'].render(escape)}"
+
+        if kind == 'list':
+            return ''.join([t['list_title'].render(escape, title=block['title']),
+                            t['list_start'].render(escape),
+                            t['list_item'].render_all(escape, block['items']),
+                            t['list_end'].render(escape)])
+        return ''
+
+    def __header(self, model):
+        if model.get('cluster') is None:
+            return ''
+        return self.templates['cluster'].render(self.escape, cluster=model['cluster'])
+
+    def render(self, model):
+        """
+        @param model: report model
+        @return: message text
+        """
+        separator = self.templates['separator'].render(self.escape)
+        return self.__header(model) + separator.join([self.__block(block) for block in model['blocks']])
+
+    def __fit_block(self, block, limit):
+        """
+        Split a block longer than limit in blocks of the same type with a part of the items
+        """
+        key = _BLOCK_ITEMS.get(block['type'])
+        if key is None or len(block[key]) <= 1 or len(self.__block(block)) <= limit:
+            return [block]
+
+        # the size of an item is an upper bound: the events separator is counted for every item
+        item_separator = len(self.templates['event_separator'].render(self.escape))
+        overhead = len(self.__block({**block, key: []}))
+        blocks = []
+        items = []
+        size = overhead
+        for item in block[key]:
+            item_size = len(self.__block({**block, key: [item]})) - overhead + item_separator
+            if len(items) > 0 and size + item_size > limit:
+                blocks.append({**block, key: items})
+                items = []
+                size = overhead
+            items.append(item)
+            size += item_size
+        blocks.append({**block, key: items})
+        return blocks
+
+    def render_parts(self, model, limit):
+        """
+        Render the model in parts of at most limit characters split on the block boundaries:
+        every part is a complete message with the cluster header, the html tags are not cut
+        @param model: report model
+        @param limit: max length of a part
+        @return: list of parts
+        """
+        header = self.__header(model)
+        separator = self.templates['separator'].render(self.escape)
+        parts = []
+        current = []
+        size = len(header)
+        for block in model['blocks']:
+            for piece in self.__fit_block(block, limit - len(header)):
+                text = self.__block(piece)
+                added = len(text) + (len(separator) if len(current) > 0 else 0)
+                if len(current) > 0 and size + added > limit:
+                    parts.append(header + separator.join(current))
+                    current = []
+                    size = len(header)
+                    added = len(text)
+                current.append(text)
+                size += added
+        if len(current) > 0 or len(parts) == 0:
+            parts.append(header + separator.join(current))
+
+        # a single entry longer than the limit is cut on the lines
+        return [piece for part in parts for piece in (split_lines(part, limit) if len(part) > limit else [part])]
+
+
+_renderers = {}
+
+
+def get_renderer(name) -> ReportRenderer:
+    """
+    Renderer of a format compiled at the first use, an unknown format is rendered as text
+    """
+    if name not in TEMPLATES:
+        name = TEXT
+    renderer = _renderers.get(name)
+    if renderer is None:
+        renderer = _renderers[name] = ReportRenderer(TEMPLATES[name], ESCAPES.get(name))
+    return renderer
+
+
+def get_format(service):
+    """
+    Report format of an Apprise service: Slack markdown, html tables for email, markdown or text
+    """
+    protocols = set()
+    for protocol in (service.protocol, service.secure_protocol):
+        if isinstance(protocol, str):
+            protocols.add(protocol)
+        elif protocol:
+            protocols.update(protocol)
+
+    notify_format = str(service.notify_format)
+    if 'slack' in protocols:
+        return SLACK
+    if notify_format == HTML and protocols & HTML_TABLE_PROTOCOLS:
+        return HTML
+    if notify_format == MARKDOWN:
+        return MARKDOWN
+    return TEXT
+
+
+def render_message(message, name, cache=None):
+    """
+    Text of a queued message in a format
+    @param message: report model or plain text, sent as it is
+    @param name: format
+    @param cache: dict format -> text, the model is rendered once for every format
+    """
+    if isinstance(message, str):
+        return message
+    if cache is not None and name in cache:
+        return cache[name]
+    text = get_renderer(name).render(message)
+    if cache is not None:
+        cache[name] = text
+    return text
+
+
+def render_parts(message, name, max_len, cache=None):
+    """
+    Numbered parts of a queued message in a format, of at most max_len characters.
+    A report model is split on the block boundaries before it is rendered, a plain text on the lines
+    @param message: report model or plain text
+    @param name: format
+    @param max_len: max length of a part, 0 or less for no limit
+    @param cache: dict format -> text, see render_message
+    @return: list of parts, the whole message when it fits in a single part
+    """
+    text = render_message(message, name, cache)
+    if isinstance(message, str) or max_len <= 0 or len(text) <= max_len:
+        return split_message(text, max_len)
+    renderer = get_renderer(name)
+    return split_numbered(len(text), max_len, lambda limit: renderer.render_parts(message, limit))
@@ -0,0 +1,75 @@
+import json
+import os
+import time
+
+from config.config import Config
+
+from utils.logger import ColoredLogger, LEVEL_MAPPING
+import logging
+
+config_app = Config()
+logger = ColoredLogger.get_logger(__name__, level=LEVEL_MAPPING.get(config_app.get_internal_log_level(), logging.INFO))
+
+CHECKPOINT_VERSION = 1
+
+
+class StateCheckpoint:
+    """
+    Versioned snapshot on disk of the last schedules and backups seen by the checker.
+    The file is written in a temporary file and renamed, a reader never finds a partial snapshot.
+    """
+
+    def __init__(self, path, interval_seconds=60):
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self.last_save = 0
+
+    def load(self, cluster_name=None):
+        """
+        Read the snapshot
+        @param cluster_name: the snapshot is discarded if it was saved for another cluster
+        @return: state dict or None if the snapshot is missing, not valid or of another version
+        """
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                checkpoint = json.load(f)
+            if checkpoint.get('version') != CHECKPOINT_VERSION:
+                logger.info(f"Checkpoint {self.path}: version {checkpoint.get('version')} ignored")
+                return None
+            if checkpoint.get('cluster') != cluster_name:
+                logger.info(f"Checkpoint {self.path}: saved for cluster {checkpoint.get('cluster')}, ignored")
+                return None
+            logger.info(f"Checkpoint {self.path}: loaded state saved at {checkpoint.get('saved_at')}")
+            return checkpoint['state']
+        except Exception as e:
+            logger.error(f"Checkpoint {self.path}: load error {str(e)}")
+            return None
+
+    def is_due(self):
+        return time.monotonic() - self.last_save >= self.interval_seconds
+
+    def save(self, state, cluster_name=None):
+        """
+        Write atomically the snapshot
+        @param state: dict to store
+        @param cluster_name: cluster identification
+        """
+        checkpoint = {'version': CHECKPOINT_VERSION,
+                      'cluster': cluster_name,
+                      'saved_at': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                      'state': state}
+
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.last_save = time.monotonic()
+        logger.debug(f"Checkpoint {self.path}: saved")
@@ -0,0 +1,120 @@
+import base64
+import os
+import threading
+
+from kubernetes import client
+
+from config.config import Config
+
+from core.k8s_watch import run_watch_loop, watch_request_timeout
+
+from utils.logger import ColoredLogger, LEVEL_MAPPING
+import logging
+
+config_app = Config()
+logger = ColoredLogger.get_logger(__name__, level=LEVEL_MAPPING.get(config_app.get_internal_log_level(), logging.INFO))
+
+
+class UserConfigWatcher:
+    """
+    Watch the user ConfigMap and Secret of the release and copy their values in the environment,
+    as main.load_user_config does at startup. A function is called on the event loop when a value changes.
+    """
+
+    def __init__(self,
+                 core_api: client.CoreV1Api,
+                 namespace,
+                 configmap_name,
+                 secret_name,
+                 timeout_seconds=300,
+                 request_timeout=None):
+
+        self.core_api = core_api
+        self.namespace = namespace
+        self.configmap_name = configmap_name
+        self.secret_name = secret_name
+        self.timeout_seconds = timeout_seconds
+        self.request_timeout = request_timeout
+
+        # environment keys written from the ConfigMap / Secret, removed when the key is deleted
+        self.keys = {'configmap': set(), 'secret': set()}
+        self.lock = threading.Lock()
+
+        self.threads = []
+        self.watchers = {}
+        self.stop_request = threading.Event()
+
+        self.event_loop = None
+        self.on_change = None
+
+    def start(self, event_loop, on_change):
+        """
+        @param event_loop: asyncio loop used to call on_change
+        @param on_change: function without arguments called when the environment is updated
+        """
+        self.event_loop = event_loop
+        self.on_change = on_change
+        for kind, list_function, name in (('configmap', self.core_api.list_namespaced_config_map, self.configmap_name),
+                                          ('secret', self.core_api.list_namespaced_secret, self.secret_name)):
+            thread = threading.Thread(target=self.__watch_loop,
+                                      args=(kind, list_function, name),
+                                      name=f"user-config-{kind}",
+                                      daemon=True)
+            self.threads.append(thread)
+            thread.start()
+
+    def stop(self):
+        self.stop_request.set()
+        for watcher in self.watchers.values():
+            watcher.stop()
+
+    @staticmethod
+    def __get_values(kind, obj):
+        data = obj.get('data') or {}
+        if kind == 'configmap':
+            return dict(data)
+        # only APPRISE is read from the secret
+        if data.get('APPRISE'):
+            return {'APPRISE': base64.b64decode(data['APPRISE']).decode('utf-8')}
+        return {}
+
+    def __apply(self, kind, values):
+        """
+        Update the environment
+        @return: True if at least a value is changed
+        """
+        changed = False
+        with self.lock:
+            for key in self.keys[kind] - set(values):
+                if key in os.environ:
+                    del os.environ[key]
+                    changed = True
+            for key, value in values.items():
+                if os.environ.get(key) != value:
+                    os.environ[key] = value
+                    changed = True
+            self.keys[kind] = set(values)
+        return changed
+
+    def __apply_event(self, kind, name, event):
+        values = {} if event['type'] == 'DELETED' else self.__get_values(kind, event['raw_object'])
+        if self.__apply(kind, values):
+            logger.info(f"User config: {kind} {name} {event['type'].lower()}, reload requested")
+            self.event_loop.call_soon_threadsafe(self.on_change)
+
+    def __watch_loop(self, kind, list_function, name):
+        # without a list the current object is received first as ADDED
+        def stream(watcher, resource_version):
+            return watcher.stream(list_function,
+                                  self.namespace,
+                                  field_selector=f"metadata.name={name}",
+                                  resource_version=resource_version,
+                                  timeout_seconds=self.timeout_seconds,
+                                  _request_timeout=watch_request_timeout(self.timeout_seconds,
+                                                                         self.request_timeout))
+
+        run_watch_loop(f"User config: watch {kind} {name}",
+                       self.stop_request,
+                       stream,
+                       lambda event: self.__apply_event(kind, name, event),
+                       on_watcher=lambda watcher: self.watchers.__setitem__(kind, watcher))
@@ -1,27 +1,38 @@
+import asyncio
 import calendar
+import time
 from datetime import datetime
 import json
 
 from config.config import Config
+from config.config_snapshot import get_config_snapshot
 from config.config_k8s_process import ConfigK8sProcess
 
-from utils.handle_error import handle_exceptions_async_method, handle_exceptions_method
-from utils.logger import ColoredLogger, LEVEL_MAPPING
+from core import report_renderer
+from core.notification_outbox import NotificationOutbox
+from core.state_checkpoint import StateCheckpoint
+from core.velero_records import BackupRecord, ScheduleRecord, diff_records
+
+from utils.handle_error import handle_exceptions_async_method
+from utils.logger import ColoredLogger, LEVEL_MAPPING, SampledDump
 import logging
 
 config_app = Config()
 logger = ColoredLogger.get_logger(__name__, level=LEVEL_MAPPING.get(config_app.get_internal_log_level(), logging.INFO))
+snapshot_dump = SampledDump(logger, every=config_app.get_debug_snapshot_every())
 
 
 def flatten_json(obj, level=0, max_level=2):
     """Format JSON with indentation up to max_level, then flatten deeper levels."""
+    if isinstance(obj, (BackupRecord, ScheduleRecord)):
+        obj = obj.to_dict()
     if isinstance(obj, dict):
         if level >= max_level:
-            return json.dumps(obj)  # Flatten deeper levels
+            return json.dumps(obj, default=lambda record: record.to_dict())  # Flatten deeper levels
         return {k: flatten_json(v, level + 1, max_level) for k, v in obj.items()}
     elif isinstance(obj, list):
         if level >= max_level:
-            return json.dumps(obj)  # Flatten deeper levels
+            return json.dumps(obj, default=lambda record: record.to_dict())  # Flatten deeper levels
         return [flatten_json(v, level + 1, max_level) for v in obj]
     else:
         return obj
@@ -38,13 +49,15 @@ class VeleroChecker:
                  dispatcher_max_msg_len=8000,
                  dispatcher_alive_message_hours=24,
                  k8s_key_config: ConfigK8sProcess = None,
-                 daemon=True):
+                 daemon=True,
+                 outbox: NotificationOutbox = None):
 
         self.queue = queue
         self.daemon = daemon
 
         self.dispatcher_max_msg_len = dispatcher_max_msg_len
         self.dispatcher_queue = dispatcher_queue
+        self.outbox = outbox
 
         self.k8s_config = ConfigK8sProcess()
         if k8s_key_config is not None:
@@ -62,49 +75,39 @@ class VeleroChecker:
 
         self.final_message = ""
         self.unique_message = False
-        self.first_run = (daemon and config_app.send_report_at_startup()) or (daemon is False)
-
-    @staticmethod
-    def get_changed_keys(old, new, skip_fields):
-        changed = []
-
-        for backup in old:
-            if backup in new:
-                for key in old[backup]:
-                    if key in skip_fields:
-                        continue
-                    elif old[backup][key] != new[backup][key]:
-                        changed.append(backup)
-                        break
-
-        return changed
-
-    def __find_dict_difference(self, old_dict, new_dict):
-        # Find keys that are unique to each dictionary
-        keys_only_in_old_dict = set(old_dict.keys()) - set(new_dict.keys())
-        keys_only_in_new_dict = set(new_dict.keys()) - set(old_dict.keys())
-
-        # Check old_dict and new_dict is dict
-        if not isinstance(old_dict, dict) or not isinstance(new_dict, dict):
-            raise ValueError("old_dict or new_dict is not dict.")
-
-        # Find keys that are common to both dictionaries but have different values
-        skip_field = ['expire', 'time_expires']
-        changed_keys = self.get_changed_keys(old_dict, new_dict, skip_field)
-
-        # Create dictionaries containing the differing key-value pairs
-        old_values = {key: old_dict[key] for key in changed_keys}
-        new_values = {key: new_dict[key] for key in changed_keys}
-
-        return {
-            "has_diff": len(changed_keys) > 0 or len(list(keys_only_in_old_dict)) > 0 or len(
-                list(keys_only_in_new_dict)) > 0,
-            "removed": list(keys_only_in_old_dict),
-            "added": list(keys_only_in_new_dict),
-            "changed": changed_keys,  # list(differing_dict1.keys()),
-            "old_values": old_values,
-            "new_values": new_values,
-        }
+        self.first_run = (daemon and get_config_snapshot().send_report_at_startup) or (daemon is False)
+
+        # state saved at the last checkpoint: after a restart the first cycle is a diff, not a full report
+        self.checkpoint = None
+        self.state_changed = False
+        if daemon and self.k8s_config.checkpoint_file:
+            self.checkpoint = StateCheckpoint(self.k8s_config.checkpoint_file,
+                                              self.k8s_config.checkpoint_interval)
+            state = self.checkpoint.load(cluster_name=self.k8s_config.cluster_id)
+            if state is not None:
+                self.old_data = self.__load_state(state)
+                self.first_run = False
+
+    def __load_state(self, state):
+        """
+        Build the records of a checkpoint state, the fingerprints are computed again in this process
+        """
+        data = {}
+        if self.k8s_config.schedules_key in state:
+            data[self.k8s_config.schedules_key] = {name: ScheduleRecord.from_dict(item) for name, item in
+                                                   state[self.k8s_config.schedules_key].items()}
+        if self.k8s_config.all_backups_key in state:
+            data[self.k8s_config.all_backups_key] = {name: BackupRecord.from_dict(item) for name, item in
+                                                     state[self.k8s_config.all_backups_key].items()}
+        return data
+
+    def __dump_state(self):
+        """
+        Serializable copy of the schedules and backups state
+        """
+        return {key: {name: record.to_dict() for name, record in self.old_data[key].items()}
+                for key in (self.k8s_config.schedules_key, self.k8s_config.all_backups_key)
+                if key in self.old_data}
 
     @handle_exceptions_async_method
     async def __put_in_queue__(self,
@@ -125,22 +128,22 @@ class VeleroChecker:
         Send message to dispatcher engine
         @param message: message to send
         """
-        logger.debug(f"send_to_dispatcher. msg len= {len(message)}-unique {self.unique_message} ")
+        logger.debug("send_to_dispatcher. msg len= %d-unique %s", len(message), self.unique_message)
         if len(message) > 0:
-            logger.debug(f"{message}")
+            logger.debug("%s", message)
             # if not self.unique_message or force_message:
             self.last_send = calendar.timegm(datetime.today().timetuple())
-            msg = ''
-            if 'cluster_name' in message:
-                if message['cluster_name'] is not None:
-                    msg = 'Cluster: ' + message['cluster_name'] + '\n'
-            if 'backups' in message:
-                msg += message['backups']
-            if 'schedules' in message:
-                msg += message['schedules']
-            if 'configs' in message:
-                msg += message['configs']
-            await self.__put_in_queue__(self.dispatcher_queue, msg)
+            blocks = []
+            for key in ('backups', 'schedules', 'configs'):
+                if key in message:
+                    blocks.extend(message[key])
+            report = report_renderer.report(message.get('cluster_name'), blocks)
+
+            # the message is stored before it is queued: it survives a restart until it is acknowledged
+            message_id = None
+            if self.outbox is not None:
+                message_id = self.outbox.append(report_renderer.dumps_message(report))
+            await self.__put_in_queue__(self.dispatcher_queue, {'id': message_id, 'message': report})
 
     async def __unpack_data(self, data):
         """
@@ -152,8 +155,8 @@ class VeleroChecker:
             if isinstance(data, dict):
                 cluster_name = await self.__process_cluster_name(data)
 
-                schedules: dict[str, str] | None = None
-                backups: dict[str, str] | None = None
+                schedules: dict[str, list] | None = None
+                backups: dict[str, list] | None = None
 
                 if self.first_run:
                     if self.k8s_config.backups_key in data:
@@ -164,6 +167,8 @@ class VeleroChecker:
                     if self.k8s_config.backups_key in data:
                         backups = await self.__process_backups_difference_report(data)
 
+                if self.first_run or len(self.old_data) == 0:
+                    self.state_changed = True
                 self.old_data = data
 
                 has_diff = False
@@ -186,29 +191,6 @@ class VeleroChecker:
         except Exception as err:
             logger.error(f"__unpack_data {str(err)}")
 
-    @handle_exceptions_method
-    def __get_backup_error_message(self, message):
-        # self.print_helper.info("_get_backup_error_message")
-        if message == '[]':
-            return ''
-        else:
-            return f'{message}'
-
-    @handle_exceptions_method
-    def __extract_days_from_str(self, str_number):
-        # self.print_helper.info("_extract_days_from_str")
-        value = -1
-
-        index = str_number.find('d')
-
-        if index != -1:
-            value = int(str_number.strip()[:index])
-
-        if value > 0:
-            return value
-        else:
-            return None
-
     async def __process_cluster_name(self, data):
         """
         Obtain cluster name
@@ -220,7 +202,7 @@ class VeleroChecker:
         self.cluster_name = {'cluster_name': nodes_name}
         return self.cluster_name
 
-    async def __process_backups_report(self, data):
+    async def __process_backups_report(self, data, full_report=False):
         # self.print_helper.info("__last_backup_report")
         try:
 
@@ -229,119 +211,70 @@ class VeleroChecker:
 
             # build message for dispatch
 
-            # counter
-            backup_count = len(backups)
-            backup_completed = 0
-
-            backup_in_progress = 0
-            backup_failed = 0
-            backup_partially_failed = 0
-            backup_in_errors = 0
-            backup_in_wrn = 0
-            expired_backup = 0
-            backup_failed_validation = 0
-
+            # single pass: backup names grouped by report section
+            by_phase = {'completed': [], 'inprogress': [], 'failedvalidation': [], 'failed': [], 'partiallyfailed': []}
+            with_errors = []
+            with_warnings = []
+            in_warning_period = []
             backup_not_retrieved = 0
 
-            # message strings
-            message = ''
-            message_header = ''
-            message_body = ''
+            expires_days_warning = self.k8s_config.expires_days_warning
+            now = time.time()
+            debug = logger.isEnabledFor(logging.DEBUG)
 
-            backup_in_progress_str = ''
-            backup_failed_str = ''
-            backup_partially_failed_str = ''
-            error_str = ''
-            wrn_str = ''
-            backup_expired_str = ''
-            backup_failed_validation_str = ''
+            for backup_name, backup_info in backups.items():
+                if debug:
+                    logger.debug('Backup name: %s', backup_name)
 
-            # point = '\u2022'
-            point = '    •'
-            list_point = '        ‣ '
+                if backup_info.expiration or backup_info.in_progress:
+                    day = backup_info.expire_days(now)
+                    if day is None or day <= 0:
+                        backup_not_retrieved += 1
+                    elif day < expires_days_warning:
+                        in_warning_period.append(backup_name)
 
-            for backup_name, backup_info in backups.items():
-                logger.debug(f'Backup name: {backup_name}')
-
-                if backup_name != "error" or 'schedule' in backup_info:
-
-                    if len(backup_info['expire']) > 0:
-
-                        day = self.__extract_days_from_str(str(backup_info['expire']))
-                        if day is None:
-                            backup_not_retrieved += 1
-                        elif day < self.k8s_config.expires_days_warning:
-                            expired_backup += 1
-                            backup_expired_str += f'\n{list_point}{str(backup_name)}'
-
-                    # add status field
-                    if len(backup_info['phase']) > 0:
-                        if backup_info['phase'].lower() == 'completed':
-                            backup_completed += 1
-                        elif backup_info['phase'].lower() == 'inprogress':
-                            backup_in_progress_str += f'\n{list_point}{str(backup_name)}'
-                            backup_in_progress += 1
-                        elif backup_info['phase'].lower() == 'failedvalidation':
-                            backup_failed_validation_str += f'\n{list_point}{str(backup_name)}'
-                            backup_failed_validation += 1
-                        elif backup_info['phase'].lower() == 'failed':
-                            backup_failed_str += f'\n{list_point}{str(backup_name)}'
-                            backup_failed += 1
-                        elif backup_info['phase'].lower() == 'partiallyfailed':
-                            backup_partially_failed_str += f'\n{list_point}{str(backup_name)}'
-                            backup_partially_failed += 1
-
-                    # add error field
-                    error = self.__get_backup_error_message(str(backup_info['errors']))
-                    if len(error) > 0:
-                        error_str += f'\n{list_point}{str(backup_name)}'
-                        backup_in_errors += 1
+                names = by_phase.get(backup_info.phase.lower())
+                if names is not None:
+                    names.append(backup_name)
 
-                    # add warning field
-                    wrn = self.__get_backup_error_message(str(backup_info['warnings']))
-                    if len(wrn) > 0:
-                        wrn_str += f'\n{list_point}{str(backup_name)}'
-                        backup_in_wrn += 1
+                if backup_info.errors > 0:
+                    with_errors.append(backup_name)
+
+                if backup_info.warnings > 0:
+                    with_warnings.append(backup_name)
             # end stats
 
-            message_header += (f'\nNamespaces:'
-                               f'\n{point} total={unscheduled["counter_all"]}'
-                               f'\n{point} unscheduled={unscheduled["counter"]}'
-                               f'\n\nBackups (based on last backup for every schedule and backup without schedule)'
-                               f'\n{point} total={backup_count}'
-                               f'\n{point} completed={backup_completed}')
-
-            if backup_in_progress > 0:
-                message_header += f'\n{point} in progress={backup_in_progress}{backup_in_progress_str}'
-            if backup_failed_validation > 0:
-                message_body += f'\n{point} failed validation={backup_failed}{backup_failed_validation_str}'
-            if backup_in_errors > 0:
-                message_body += f'\n{point} with errors={backup_in_errors}{error_str}'
-            if backup_in_wrn > 0:
-                message_body += f'\n{point} with warnings={backup_in_wrn}{wrn_str}'
-            if backup_failed > 0:
-                message_body += f'\n{point} failed={backup_failed}{backup_failed_str}'
-            if backup_partially_failed > 0:
-                message_body += f'\n{point} partially Failed={backup_partially_failed}{backup_partially_failed_str}'
-            if expired_backup > 0:
-                message_body += (f'\n{point} in warning period={expired_backup} '
-                                 f'(expires day less than {self.k8s_config.expires_days_warning}d)'
-                                 f'{backup_expired_str}')
-
-            # build unscheduled namespaces string
-            if len(unscheduled) > 0:
-                str_namespace = ''
-                for name_s in unscheduled['difference']:
-                    str_namespace += f'{list_point}{name_s}\n'
-                if len(str_namespace) > 0:
-                    message = (
-                        f'\n\nNamespace without active backup ({unscheduled["counter"]}/{unscheduled["counter_all"]})'
-                        f':\n{str_namespace}')
-
-            if len(self.old_data) == 0:
-                return {'backups': f"{message_header}{message_body}{message}"}
-            else:
-                return {'backups': message_body}
+            def counter(label, names, note=''):
+                return [report_renderer.entry(label, len(names), names, note)] if len(names) > 0 else []
+
+            body = (counter('failed validation', by_phase['failedvalidation']) +
+                    counter('with errors', with_errors) +
+                    counter('with warnings', with_warnings) +
+                    counter('failed', by_phase['failed']) +
+                    counter('partially Failed', by_phase['partiallyfailed']) +
+                    counter('in warning period', in_warning_period,
+                            f' (expires day less than {expires_days_warning}d)'))
+
+            if not full_report and len(self.old_data) > 0:
+                return {'backups': [report_renderer.section(None, body)] if len(body) > 0 else []}
+
+            blocks = [report_renderer.section('Namespaces',
+                                              [report_renderer.entry('total', unscheduled['counter_all']),
+                                               report_renderer.entry('unscheduled', unscheduled['counter'])]),
+                      report_renderer.section('Backups (based on last backup for every schedule and backup '
+                                              'without schedule)',
+                                              [report_renderer.entry('total', len(backups)),
+                                               report_renderer.entry('completed', len(by_phase['completed']))] +
+                                              counter('in progress', by_phase['inprogress']) +
+                                              body)]
+
+            # unscheduled namespaces
+            if len(unscheduled) > 0 and len(unscheduled['difference']) > 0:
+                blocks.append(report_renderer.item_list(
+                    f'Namespace without active backup ({unscheduled["counter"]}/{unscheduled["counter_all"]})',
+                    list(unscheduled['difference'])))
+
+            return {'backups': blocks}
 
         except Exception as err:
             logger.error(f"__last_backup_report {str(err)}")
@@ -351,151 +284,201 @@ class VeleroChecker:
 
         backups = data[self.k8s_config.all_backups_key]
 
-        if self.k8s_config.all_backups_key not in self.old_data or self.old_data[self.k8s_config.all_backups_key] == data[self.k8s_config.all_backups_key]:
+        if self.k8s_config.all_backups_key not in self.old_data:
+            return
+
+        backups_diff = diff_records(self.old_data[self.k8s_config.all_backups_key], backups)
+
+        if not backups_diff['has_diff']:
             logger.info("Check for differences in backups: do nothing same data")
             return
 
-        backups_diff = self.__find_dict_difference(self.old_data[self.k8s_config.all_backups_key], backups)
+        self.state_changed = True
+        backup_messages = []
 
-        if backups_diff['has_diff']:
-            backup_messages = []
+        cfg = get_config_snapshot()
+        prefix = cfg.report_backup_item_prefix
 
-            for backup_name in (backups_diff['added'] + backups_diff['changed']):
-                backup_info = backups[backup_name]
-                message = ''
-                if 'phase' not in backup_info or ('phase' in backup_info and len(backup_info['phase']) == 0):
-                    logger.error(f'{backup_info["phase"]}: missing phase, maybe waiting for startup')
-                elif len(backup_info['phase']) > 0:
-                    logger.debug(f'backup_name: {backup_name} Phase: {backup_info["phase"].lower()}')
+        for backup_name in (backups_diff['added'] + backups_diff['changed']):
+            backup_info = backups[backup_name]
+            message = ''
+            if len(backup_info.phase) == 0:
+                logger.error(f'{backup_name}: missing phase, maybe waiting for startup')
+            else:
+                phase = backup_info.phase.lower()
+                logger.debug('backup_name: %s Phase: %s', backup_name, phase)
 
-                    error = self.__get_backup_error_message(str(backup_info['errors']))
-                    wrn = self.__get_backup_error_message(str(backup_info['warnings']))
+                error = backup_info.errors > 0
+                wrn = backup_info.warnings > 0
 
-                    if (not config_app.get_notification_skip_completed() or len(error) > 0 or len(wrn) > 0) and \
-                            backup_info['phase'].lower() == 'completed':
-                        message += (f'{config_app.get_report_backup_item_prefix()}Velero backup {str(backup_name)} '
-                                    f'completed')
+                if (not cfg.notification_skip_completed or error or wrn) and \
+                        phase == 'completed':
+                    message += (f'{prefix}Velero backup {str(backup_name)} '
+                                f'completed')
 
-                    elif not config_app.get_notification_skip_inprogress() and backup_info['phase'].lower() == 'inprogress':
-                        message += (f'{config_app.get_report_backup_item_prefix()}Velero backup {str(backup_name)} in '
-                                    f'progress')
+                elif not cfg.notification_skip_inprogress and phase == 'inprogress':
+                    message += (f'{prefix}Velero backup {str(backup_name)} in '
+                                f'progress')
 
-                    elif not config_app.get_notification_skip_deleting() and backup_info['phase'].lower() == 'deleting':
-                        message += (f'{config_app.get_report_backup_item_prefix()}Velero backup {str(backup_name)} '
-                                    f'deleting')
+                elif not cfg.notification_skip_deleting and phase == 'deleting':
+                    message += (f'{prefix}Velero backup {str(backup_name)} '
+                                f'deleting')
 
-                    elif backup_info['phase'].lower() == 'failed':
-                        message += (f'{config_app.get_report_backup_item_prefix()}Velero backup {str(backup_name)} '
-                                    f'failed')
+                elif phase == 'failed':
+                    message += (f'{prefix}Velero backup {str(backup_name)} '
+                                f'failed')
 
-                    elif backup_info['phase'].lower() == 'partiallyfailed':
-                        message += (f'{config_app.get_report_backup_item_prefix()}Velero backup {str(backup_name)} '
-                                    f'partially failed')
+                elif phase == 'partiallyfailed':
+                    message += (f'{prefix}Velero backup {str(backup_name)} '
+                                f'partially failed')
 
-                    elif backup_info['phase'].lower() not in ['completed', 'inprogress', 'deleting', 'failed',
-                                                              'partiallyfailed']:
-                        message += (f"{config_app.get_report_backup_item_prefix()}Velero backup {str(backup_name)} "
-                                    f"{backup_info['phase'].lower()}")
+                elif phase not in ['completed', 'inprogress', 'deleting', 'failed',
+                                   'partiallyfailed']:
+                    message += (f"{prefix}Velero backup {str(backup_name)} "
+                                f"{phase}")
 
-                    # add error field
-                    if backup_info['phase'].lower() in ['completed', 'failed', 'partiallyfailed']:
-                        if len(error) > 0:
-                            message += f' with errors'
+                # add error field
+                if phase in ['completed', 'failed', 'partiallyfailed']:
+                    if error:
+                        message += f' with errors'
 
-                        # add warning field
-                        if len(wrn) > 0:
-                            message += f' with warnings'
+                    # add warning field
+                    if wrn:
+                        message += f' with warnings'
 
-                if message != '':
-                    backup_messages.append(message)
-            # end for
+            if message != '':
+                backup_messages.append(message)
+        # end for
 
-            if not config_app.get_notification_skip_removed():
-                for backup_name in backups_diff['removed']:
-                    message = f'{config_app.get_report_backup_item_prefix()}Velero backup {str(backup_name)} removed'
-                    backup_messages.append(message)
+        if not cfg.notification_skip_removed:
+            for backup_name in backups_diff['removed']:
+                message = f'{prefix}Velero backup {str(backup_name)} removed'
+                backup_messages.append(message)
 
-            if len(backup_messages) > 0:
-                return {'backups': '\n'.join(backup_messages[::-1])}
-            return None
+        if len(backup_messages) > 0:
+            return {'backups': [report_renderer.events([report_renderer.event(message)
+                                                        for message in backup_messages[::-1]])]}
+        return None
 
     async def __process_schedule_difference_report(self, data):
         logger.info("Check for differences in schedules")
 
         try:
-            if self.k8s_config.schedules_key not in self.old_data or self.old_data[self.k8s_config.schedules_key] == data[self.k8s_config.schedules_key]:
+            if self.k8s_config.schedules_key not in self.old_data:
+                return
+
+            old_schedules = self.old_data[self.k8s_config.schedules_key]
+            schedules = data[self.k8s_config.schedules_key]
+            diff = diff_records(old_schedules, schedules)
+
+            if not diff['has_diff']:
                 logger.info("Check for differences in schedules: do nothing same data")
                 return
 
+            self.state_changed = True
             schedule_messages = []
-            diff = self.__find_dict_difference(self.old_data[self.k8s_config.schedules_key],
-                                               data[self.k8s_config.schedules_key])
+            prefix = get_config_snapshot().report_schedule_item_prefix
 
             if len(diff) > 0:
                 if len(diff['removed']) > 0:
                     for rem in diff['removed']:
-                        schedule_messages.append(
-                            f'{config_app.get_report_schedule_item_prefix()}Velero scheduled {rem} removed')
+                        schedule_messages.append(report_renderer.event(
+                            f'{prefix}Velero scheduled {rem} removed'))
 
-                if len(self.old_data[self.k8s_config.schedules_key]) > 0 and len(diff['added']) > 0:
+                if len(old_schedules) > 0 and len(diff['added']) > 0:
                     for add in diff['added']:
-                        schedule_messages.append(
-                            f'{config_app.get_report_schedule_item_prefix()}Velero scheduled {add} added')
+                        schedule_messages.append(report_renderer.event(
+                            f'{prefix}Velero scheduled {add} added'))
+
+                if len(diff['changed']) > 0:
+                    for schedule_name in diff['changed']:
+                        details = []
+                        for field in ScheduleRecord.fields:
+                            old_value = getattr(old_schedules[schedule_name], field)
+                            new_value = getattr(schedules[schedule_name], field)
+                            if old_value != new_value:
+                                # the records keep tuples, the report shows lists
+                                if isinstance(old_value, tuple):
+                                    old_value = list(old_value)
+                                if isinstance(new_value, tuple):
+                                    new_value = list(new_value)
+                                details.append(f"{field} from {old_value} to {new_value}")
+                        schedule_messages.append(report_renderer.event(f"{prefix}Velero scheduled {schedule_name} "
+                                                                       f"updated:", details))
+
+            return {'schedules': [report_renderer.events(schedule_messages[::-1])]}
 
-                if len(diff['old_values']) > 0:
-                    for schedule_name in diff['old_values']:
-                        message = (f"{config_app.get_report_schedule_item_prefix()}Velero scheduled {schedule_name} "
-                                   f"updated:")
-                        for field in diff['old_values'][schedule_name]:
-                            if diff['old_values'][schedule_name][field] != diff['new_values'][schedule_name][field]:
-                                message += (f"\n{field} from {diff['old_values'][schedule_name][field]} "
-                                            f"to {diff['new_values'][schedule_name][field]}")
-                        schedule_messages.append(message)
+        except Exception as err:
+            logger.error(f"{str(err)}")
 
-            return {'schedules': '\n'.join(schedule_messages[::-1])}
+    async def __save_checkpoint(self):
+        """
+        Save the schedules and backups state if it is changed since the last checkpoint
+        """
+        if self.checkpoint is None or not self.state_changed or not self.checkpoint.is_due():
+            return
+
+        state = self.__dump_state()
 
+        try:
+            await asyncio.get_running_loop().run_in_executor(None,
+                                                             self.checkpoint.save,
+                                                             state,
+                                                             self.k8s_config.cluster_id)
+            self.state_changed = False
         except Exception as err:
-            logger.error(f"{str(err)}")
+            logger.error(f"save checkpoint {str(err)}")
+
+    async def send_report(self, data):
+        """
+        Send the full report of a snapshot, the state used to compute the differences is not changed
+        @param data: snapshot built by KubernetesStatusRun
+        @return: True if the report is queued for the dispatcher
+        """
+        messages = {'cluster_name': data.get(self.k8s_config.cluster_name_key)}
+        if self.k8s_config.backups_key in data:
+            backups = await self.__process_backups_report(data, full_report=True)
+            if isinstance(backups, dict):
+                messages.update(backups)
+        if len(messages) == 1:
+            return False
+        await self.__send_to_dispatcher(messages)
+        return True
 
     @handle_exceptions_async_method
     async def send_active_configuration(self, sub_title=None):
         """
         Send a message to Apprise engine of the active setup
         """
-        point = '    •'
-        # list_point = '        ‣ '
-
-        title = "vui-watchdog is restarted"
-        if sub_title is not None and len(sub_title) > 0:
-            title = f"{title}\n{sub_title}"
-
         logger.info(f"send active configuration")
 
-        msg = f'Configuration setup:\n'
+        cfg = get_config_snapshot()
+        blocks = [report_renderer.title("vui-watchdog is restarted", sub_title)]
         if self.k8s_config is not None:
-            msg = msg + f"{point}Notification backups ENABLE={'TRUE' if self.k8s_config.backup_enable else 'FALSE'}\n"
-            msg = msg + f"{point}Notification scheduled ENABLE={'TRUE' if self.k8s_config.schedule_enable else 'FALSE'}\n"
-            msg = msg + (f"{point}Notification skip completed="
-                         f"{'TRUE' if config_app.get_notification_skip_completed() else 'FALSE'}\n")
-            msg = msg + f"{point}Notification skip deleting={'TRUE' if config_app.get_notification_skip_deleting() else 'FALSE'}\n"
-            msg = msg + (f"{point}Notification skip in progress="
-                         f"{'TRUE' if config_app.get_notification_skip_inprogress() else 'FALSE'}\n")
-            msg = msg + f"{point}Notification skip removed={'TRUE' if config_app.get_notification_skip_removed() else 'FALSE'}\n"
-            msg = msg + f"{point}Process cycle={config_app.process_run_sec()}\n"
-            msg = msg + f"{point}Expire days warning={config_app.velero_expired_days_warning()}\n"
-            msg = msg + f"{point}Backups prefix={config_app.get_report_backup_item_prefix()}\n"
-            msg = msg + f"{point}Schedules prefix={config_app.get_report_schedule_item_prefix()}\n"
+            def flag(value):
+                return 'TRUE' if value else 'FALSE'
+
+            blocks.append(report_renderer.section('Configuration setup', [
+                report_renderer.entry('Notification backups ENABLE', flag(self.k8s_config.backup_enable)),
+                report_renderer.entry('Notification scheduled ENABLE', flag(self.k8s_config.schedule_enable)),
+                report_renderer.entry('Notification skip completed', flag(cfg.notification_skip_completed)),
+                report_renderer.entry('Notification skip deleting', flag(cfg.notification_skip_deleting)),
+                report_renderer.entry('Notification skip in progress', flag(cfg.notification_skip_inprogress)),
+                report_renderer.entry('Notification skip removed', flag(cfg.notification_skip_removed)),
+                report_renderer.entry('Process cycle', cfg.process_run_sec),
+                report_renderer.entry('Expire days warning', cfg.expires_days_warning),
+                report_renderer.entry('Backups prefix', cfg.report_backup_item_prefix),
+                report_renderer.entry('Schedules prefix', cfg.report_schedule_item_prefix),
+            ]))
 
             # if self.alive_message_seconds >= 3600:
             #     msg = msg + f"\nAlive message every {int(self.alive_message_seconds / 3600)} hours"
             # else:
             #     msg = msg + f"\nAlive message every {int(self.alive_message_seconds / 60)} minutes"
         else:
-            msg = "Error init config class"
-
-        msg = f"{title}\n\n{msg}"
+            blocks.append(report_renderer.events([report_renderer.event("Error init config class")]))
 
-        await self.__send_to_dispatcher({'cluster_name': config_app.k8s_cluster_identification(), 'configs': msg})
+        await self.__send_to_dispatcher({'cluster_name': cfg.cluster_id, 'configs': blocks})
 
     async def run(self, loop=True):
         """
@@ -503,7 +486,7 @@ class VeleroChecker:
         """
         try:
             logger.info("checker run")
-            if self.daemon and config_app.send_start_message():  # do not send configuration message in no daemon app
+            if self.daemon and get_config_snapshot().send_start_message:  # do not send configuration message in no daemon app
                 await self.send_active_configuration()
 
             flag = True
@@ -517,14 +500,16 @@ class VeleroChecker:
                     break
 
                 logger.info("Velero checker: new element received")
-                logger.debug(f"Velero checker: new element received"
-                             "\n--------------------------------------------------------------------------------------"
-                             f"\n{json.dumps(flatten_json(item), sort_keys=True, indent=4)}"
-                             f"\n-------------------------------------------------------------------------------------")
+                snapshot_dump.dump("Velero checker: new element received"
+                                   "\n--------------------------------------------------------------------------------------"
+                                   "\n%s"
+                                   "\n-------------------------------------------------------------------------------------",
+                                   item, transform=flatten_json, sort_keys=True, indent=4)
 
                 if item is not None:
                     await self.__unpack_data(item)
                     self.first_run = False
+                    await self.__save_checkpoint()
 
         except Exception as err:
             logger.error(f"run {str(err)}")
@@ -0,0 +1,175 @@
+import threading
+
+from kubernetes import client
+
+from config.config import Config
+
+from core.k8s_watch import run_watch_loop, watch_request_timeout
+
+from utils import metrics
+from utils.logger import ColoredLogger, LEVEL_MAPPING
+import logging
+
+config_app = Config()
+logger = ColoredLogger.get_logger(__name__, level=LEVEL_MAPPING.get(config_app.get_internal_log_level(), logging.INFO))
+
+
+class VeleroInformer:
+    """
+    Keep an in-memory copy of Velero custom resources updated with a list + watch cycle.
+    A full list is performed only at startup and when the watch reports that the
+    resourceVersion is too old (410 Gone); afterward only change events are received.
+    """
+
+    group = 'velero.io'
+    version = 'v1'
+
+    def __init__(self,
+                 custom_api: client.CustomObjectsApi,
+                 namespace='velero',
+                 plurals=('schedules', 'backups'),
+                 timeout_seconds=300,
+                 page_size=500,
+                 transforms=None,
+                 label_selectors=None,
+                 request_timeout=None):
+
+        self.custom_api = custom_api
+        self.namespace = namespace
+        self.plurals = plurals
+        self.timeout_seconds = timeout_seconds
+        self.page_size = page_size
+        # optional function for every plural applied to an object before it is stored,
+        # the objects transformed to None are not stored
+        self.transforms = transforms or {}
+        # optional label selector for every plural, the filter is applied by the api server
+        self.label_selectors = label_selectors or {}
+        self.request_timeout = request_timeout
+
+        self.stores = {plural: {} for plural in plurals}
+        self.synced = {plural: threading.Event() for plural in plurals}
+        self.lock = threading.Lock()
+
+        self.threads = []
+        self.watchers = {}
+        self.stop_request = threading.Event()
+
+        self.event_loop = None
+        self.changed = None
+
+    def start(self, event_loop, changed):
+        """
+        Start a watch thread for every resource
+        @param event_loop: asyncio loop used to notify changes
+        @param changed: asyncio.Event set every time a store is updated
+        """
+        self.event_loop = event_loop
+        self.changed = changed
+        for plural in self.plurals:
+            thread = threading.Thread(target=self.__watch_loop,
+                                      args=(plural,),
+                                      name=f"velero-informer-{plural}",
+                                      daemon=True)
+            self.threads.append(thread)
+            thread.start()
+
+    def stop(self):
+        self.stop_request.set()
+        for watcher in self.watchers.values():
+            watcher.stop()
+
+    def has_synced(self, plural):
+        return plural in self.synced and self.synced[plural].is_set()
+
+    def list(self, plural):
+        """
+        Return the cached objects with the same shape of list_namespaced_custom_object
+        @param plural: resource name
+        """
+        with self.lock:
+            return {'items': list(self.stores[plural].values())}
+
+    def __notify(self):
+        if self.event_loop is not None and self.changed is not None:
+            self.event_loop.call_soon_threadsafe(self.changed.set)
+
+    def __relist(self, plural):
+        """
+        Full paginated list of the resource, replace the store and return the resourceVersion to watch from
+        """
+        transform = self.transforms.get(plural)
+        store = {}
+        resource_version = None
+        continue_token = None
+        while True:
+            kwargs = {'limit': self.page_size, '_request_timeout': self.request_timeout}
+            if self.label_selectors.get(plural):
+                kwargs['label_selector'] = self.label_selectors[plural]
+            if continue_token:
+                kwargs['_continue'] = continue_token
+            with metrics.api_request_duration.time(plural):
+                response = self.custom_api.list_namespaced_custom_object(self.group,
+                                                                         self.version,
+                                                                         self.namespace,
+                                                                         plural,
+                                                                         **kwargs)
+            for item in response.get('items', []):
+                value = transform(item) if transform else item
+                if value is not None:
+                    store[item['metadata']['name']] = value
+
+            resource_version = response.get('metadata', {}).get('resourceVersion', resource_version)
+            continue_token = response.get('metadata', {}).get('continue')
+            if not continue_token:
+                break
+
+        with self.lock:
+            self.stores[plural] = store
+        self.synced[plural].set()
+        logger.info(f"Informer {plural}: listed {len(store)} items")
+        self.__notify()
+        return resource_version
+
+    def __apply_event(self, plural, event):
+        event_type = event['type']
+        obj = event['raw_object']
+        name = obj.get('metadata', {}).get('name')
+        if name is None:
+            return
+
+        value = None
+        if event_type != 'DELETED':
+            transform = self.transforms.get(plural)
+            value = transform(obj) if transform else obj
+        with self.lock:
+            if value is None:
+                self.stores[plural].pop(name, None)
+            else:
+                self.stores[plural][name] = value
+        logger.debug("Informer %s: %s %s", plural, event_type, name)
+        self.__notify()
+
+    def __watch_loop(self, plural):
+        kwargs = {}
+        if self.label_selectors.get(plural):
+            kwargs['label_selector'] = self.label_selectors[plural]
+
+        def stream(watcher, resource_version):
+            return watcher.stream(self.custom_api.list_namespaced_custom_object,
+                                  self.group,
+                                  self.version,
+                                  self.namespace,
+                                  plural,
+                                  resource_version=resource_version,
+                                  timeout_seconds=self.timeout_seconds,
+                                  allow_watch_bookmarks=True,
+                                  _request_timeout=watch_request_timeout(self.timeout_seconds,
+                                                                         self.request_timeout),
+                                  **kwargs)
+
+        run_watch_loop(f"Informer {plural}",
+                       self.stop_request,
+                       stream,
+                       lambda event: self.__apply_event(plural, event),
+                       relist=lambda: self.__relist(plural),
+                       on_watcher=lambda watcher: self.watchers.__setitem__(plural, watcher))
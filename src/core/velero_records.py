@@ -0,0 +1,221 @@
+import fnmatch
+import sys
+from datetime import datetime, timezone
+
+
+def parse_timestamp(value):
+    """
+    Convert an RFC3339 timestamp (2024-01-31T10:00:00Z) in epoch seconds.
+    datetime.fromisoformat is implemented in C: faster than slicing the fields in python
+    @return: epoch seconds, 0 if the value is missing or not valid (e.g. 'N/A')
+    """
+    if not value:
+        return 0
+    if value[-1] in 'Zz':
+        # python < 3.11 does not accept the Z suffix
+        value = value[:-1] + '+00:00'
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        return 0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _count(value):
+    """
+    Velero reports errors and warnings as counters, older objects may have a list
+    """
+    if isinstance(value, int):
+        return value
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    return 0
+
+
+class BackupRecord:
+    """
+    Compact view of a Velero Backup used by the watchdog
+    """
+
+    __slots__ = ('name', 'phase', 'namespace', 'schedule', 'errors', 'warnings',
+                 'created', 'completed', 'expiration', 'in_progress', 'fingerprint')
+
+    def __init__(self, name, phase='', namespace='', schedule=None, errors=0, warnings=0,
+                 created=0, completed=0, expiration=0, in_progress=False):
+        self.name = name
+        self.phase = _intern(phase)
+        self.namespace = _intern(namespace)
+        self.schedule = _intern(schedule)
+        self.errors = errors
+        self.warnings = warnings
+        self.created = created
+        self.completed = completed
+        self.expiration = expiration
+        self.in_progress = in_progress
+        # content fingerprint computed once, the diff compares integers; the volatile expiration field is excluded
+        self.fingerprint = hash((self.phase, self.namespace, self.schedule, errors, warnings, created, completed))
+
+    @classmethod
+    def from_k8s(cls, backup):
+        """
+        Build the record from a Backup custom object
+        @return: record or None if the backup has no status
+        """
+        status = backup.get('status', {})
+        if status == {}:
+            return None
+
+        metadata = backup['metadata']
+        labels = metadata.get('labels') or {}
+
+        expiration = 0
+        in_progress = False
+        if 'phase' in status:
+            expiration = parse_timestamp(status.get('expiration'))
+        else:
+            in_progress = 'progress' in status
+
+        return cls(name=metadata['name'],
+                   phase=status.get('phase', ''),
+                   namespace=backup.get('namespace', ''),
+                   schedule=labels.get('velero.io/schedule-name'),
+                   errors=_count(status.get('errors', 0)),
+                   warnings=_count(status.get('warnings', 0)),
+                   created=parse_timestamp(metadata.get('creationTimestamp')),
+                   completed=parse_timestamp(status.get('completionTimestamp')),
+                   expiration=expiration,
+                   in_progress=in_progress)
+
+    def expire_days(self, now):
+        """
+        Days before the expiration
+        @param now: epoch seconds of the current cycle
+        @return: days or None if the expiration is not known
+        """
+        if not self.expiration:
+            return None
+        return (self.expiration - now) // 86400
+
+    def to_dict(self):
+        return {'name': self.name,
+                'phase': self.phase,
+                'namespace': self.namespace,
+                'schedule': self.schedule,
+                'errors': self.errors,
+                'warnings': self.warnings,
+                'created': self.created,
+                'completed': self.completed,
+                'expiration': self.expiration,
+                'in_progress': self.in_progress}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class ScheduleRecord:
+    """
+    Compact view of a Velero Schedule used by the watchdog
+    """
+
+    __slots__ = ('name', 'included_namespaces', 'excluded_namespaces', 'included_resources',
+                 'default_volumes_to_fs_backup', 'cron_time', 'fingerprint')
+
+    # fields reported when a schedule is updated
+    fields = ('included_namespaces', 'excluded_namespaces', 'included_resources',
+              'default_volumes_to_fs_backup', 'cron_time')
+
+    def __init__(self, name, included_namespaces=(), included_resources=(), default_volumes_to_fs_backup=None,
+                 cron_time='', excluded_namespaces=()):
+        self.name = name
+        self.included_namespaces = tuple(_intern(item) for item in included_namespaces)
+        self.excluded_namespaces = tuple(_intern(item) for item in excluded_namespaces)
+        self.included_resources = tuple(_intern(item) for item in included_resources)
+        self.default_volumes_to_fs_backup = default_volumes_to_fs_backup
+        self.cron_time = cron_time
+        self.fingerprint = hash((self.included_namespaces, self.excluded_namespaces, self.included_resources,
+                                 repr(default_volumes_to_fs_backup), cron_time))
+
+    @classmethod
+    def from_k8s(cls, schedule):
+        """
+        Build the record from a Schedule custom object
+        """
+        spec = schedule.get('spec', {})
+        template = spec.get('template', {})
+        return cls(name=schedule['metadata']['name'],
+                   included_namespaces=template.get('includedNamespaces', []),
+                   excluded_namespaces=template.get('excludedNamespaces', []),
+                   included_resources=spec.get('includedResources', []),
+                   default_volumes_to_fs_backup=template.get('defaultVolumesToFsBackup', []),
+                   cron_time=spec.get('schedule', ''))
+
+    def to_dict(self):
+        return {'name': self.name,
+                'included_namespaces': list(self.included_namespaces),
+                'excluded_namespaces': list(self.excluded_namespaces),
+                'included_resources': list(self.included_resources),
+                'default_volumes_to_fs_backup': self.default_volumes_to_fs_backup,
+                'cron_time': self.cron_time}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def covers_namespace(self, namespace):
+        """
+        Check if the backups of the schedule include a namespace.
+        An empty includedNamespaces or '*' includes every namespace, the entries can be glob patterns;
+        excludedNamespaces wins over the included ones. The template labelSelector filters the resources
+        inside the namespaces, it does not select the namespaces
+        @param namespace: namespace name
+        """
+        if len(self.included_namespaces) > 0 and not _match_names(namespace, self.included_namespaces):
+            return False
+        if len(self.excluded_namespaces) > 0 and _match_names(namespace, self.excluded_namespaces):
+            return False
+        return True
+
+
+def _match_names(namespace, patterns):
+    for pattern in patterns:
+        if pattern == namespace or pattern == '*':
+            return True
+        if ('*' in pattern or '?' in pattern or '[' in pattern) and fnmatch.fnmatchcase(namespace, pattern):
+            return True
+    return False
+
+
+def diff_records(old_records, new_records):
+    """
+    Compare two record maps by fingerprint in a single pass, a record shared by the two maps is unchanged
+    @param old_records: name -> record of the previous snapshot
+    @param new_records: name -> record of the current snapshot
+    @return: dict with added, removed and changed names
+    """
+    added = []
+    changed = []
+    for name, record in new_records.items():
+        old_record = old_records.get(name)
+        if old_record is None:
+            added.append(name)
+        elif old_record is not record and old_record.fingerprint != record.fingerprint:
+            changed.append(name)
+
+    # every old record is in the new map unless the counts say otherwise
+    removed = []
+    if len(old_records) != len(new_records) - len(added):
+        removed = [name for name in old_records if name not in new_records]
+
+    return {
+        "has_diff": len(added) > 0 or len(removed) > 0 or len(changed) > 0,
+        "added": added,
+        "removed": removed,
+        "changed": changed
+    }
@@ -1,16 +1,29 @@
 import re
-from datetime import datetime
-from kubernetes import client, config
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from collections import OrderedDict
 from config.config import Config
+from config.config_snapshot import get_config_snapshot
+
+from core.velero_informer import VeleroInformer
+from core.namespace_coverage import NamespaceCoverage
+from core.namespace_informer import NamespaceInformer, list_namespace_metadata
+from core.velero_records import BackupRecord, ScheduleRecord
 
 from utils.handle_error import handle_exceptions_method
+from utils.k8s_client import get_core_v1_api, get_custom_objects_api
+from utils import metrics
 from utils.logger import ColoredLogger, LEVEL_MAPPING
 import logging
 
 config_app = Config()
 logger = ColoredLogger.get_logger(__name__, level=LEVEL_MAPPING.get(config_app.get_internal_log_level(), logging.INFO))
 
+# namespaces names with the cached result of the ignore patterns
+NAMESPACE_CACHE_SIZE = 16384
+
 
 class VeleroStatus:
 
@@ -18,55 +31,153 @@ class VeleroStatus:
     def __init__(self, k8s_config):
 
         self.k8s_config = k8s_config
-        if k8s_config.k8s_in_cluster_mode:
-            config.load_incluster_config()
-        else:
-            config.load_kube_config(config_file=k8s_config.k8s_config_file)
-        self.v1 = client.CoreV1Api()
-        self.client = client.CustomObjectsApi()
+        # clients of the process wide registry: a new instance reuses the warm connections
+        self.v1 = get_core_v1_api()
+        self.client = get_custom_objects_api()
         self.expires_day_warning = k8s_config.expires_days_warning
 
-        self.ignored_namespace = k8s_config.ignore_namespace
+        # namespace -> schedules index, updated incrementally every cycle or by the namespace informer
+        self.coverage = NamespaceCoverage()
+        self.namespace_informer = None
+
+        self.ignored_namespace = []
+        self.ignored_namespace_regex = None
+        self.is_ignored_namespace = None
+        self.set_ignored_namespace(k8s_config.ignore_namespace)
+        self.page_size = k8s_config.list_page_size
+        self.request_timeout = k8s_config.api_timeout_seconds
+
+        # blocking api server calls run in a bounded pool, the asyncio loop is never blocked
+        self.executor = ThreadPoolExecutor(max_workers=k8s_config.api_workers, thread_name_prefix='k8s-api')
+
+        self.label_selectors = self.__get_label_selectors(k8s_config)
+        self.monitored_schedules = set(k8s_config.monitored_schedules)
+
+        self.informer = None
+
+    @staticmethod
+    def __get_label_selectors(k8s_config):
+        """
+        Label selector of backups and schedules sent to the api server.
+        The monitored schedules restrict the backups with the velero.io/schedule-name label,
+        the backups created without a schedule are excluded too
+        """
+        backup_selector = [k8s_config.backup_label_selector] if k8s_config.backup_label_selector else []
+        if len(k8s_config.monitored_schedules) > 0:
+            backup_selector.append(f"velero.io/schedule-name in ({','.join(k8s_config.monitored_schedules)})")
+
+        return {'backups': ','.join(backup_selector),
+                'schedules': k8s_config.schedule_label_selector}
+
+    def start_watch(self, event_loop, changed):
+        """
+        Start the informer: schedules and backups are listed once and then kept updated by watch events
+        @param event_loop: asyncio loop used to notify changes
+        @param changed: asyncio.Event set when a schedule or a backup changes
+        """
+        if self.informer is None:
+            self.informer = VeleroInformer(self.client,
+                                           namespace=get_config_snapshot().velero_namespace,
+                                           timeout_seconds=self.k8s_config.watch_timeout_seconds,
+                                           page_size=self.page_size,
+                                           transforms={'backups': BackupRecord.from_k8s},
+                                           label_selectors=self.label_selectors,
+                                           request_timeout=self.request_timeout)
+            self.informer.start(event_loop, changed)
+
+        if self.namespace_informer is None and self.k8s_config.backup_enable:
+            self.namespace_informer = NamespaceInformer(self.v1,
+                                                        self.coverage,
+                                                        accept=lambda name: not self.is_ignored_namespace(name),
+                                                        timeout_seconds=self.k8s_config.watch_timeout_seconds,
+                                                        page_size=self.page_size,
+                                                        request_timeout=self.request_timeout)
+            self.namespace_informer.start()
+
+    def __iter_velero_pages(self, namespace, plural):
+        """
+        Yield velero custom objects page by page: from the informer cache when it is synced,
+        from the api server with limit/continue otherwise
+        """
+        if self.informer is not None \
+                and self.informer.namespace == namespace \
+                and self.informer.has_synced(plural):
+            # the backups are stored as BackupRecord by the informer
+            yield self.informer.list(plural)['items']
+            return
+
+        continue_token = None
+        while True:
+            kwargs = {'limit': self.page_size}
+            if self.label_selectors.get(plural):
+                kwargs['label_selector'] = self.label_selectors[plural]
+            if continue_token:
+                kwargs['_continue'] = continue_token
+            with metrics.api_request_duration.time(plural):
+                response = self.client.list_namespaced_custom_object('velero.io', 'v1', namespace, plural,
+                                                                     _request_timeout=self.request_timeout,
+                                                                     **kwargs)
+            yield response.get('items', [])
+
+            continue_token = response.get('metadata', {}).get('continue')
+            if not continue_token:
+                break
+
+    def set_ignored_namespace(self, regex_list):
+        """
+        Compile the IGNORE_NM patterns, the cached results of the previous patterns are discarded.
+        The patterns are joined in a single alternation when the result is the same: a pattern with
+        inline global flags (e.g. (?i)) or groups, that can be referenced, is matched on its own
+        @param regex_list: namespace regex patterns
+        """
+        self.ignored_namespace = list(regex_list)
+        self.ignored_namespace_patterns = []
+        for pattern in self.ignored_namespace:
+            try:
+                self.ignored_namespace_patterns.append(re.compile(pattern))
+            except re.error as e:
+                logger.error(f"ignored namespace: invalid regex {pattern}: {str(e)}")
+
+        self.ignored_namespace_regex = None
+        default_flags = re.compile('').flags
+        if len(self.ignored_namespace_patterns) > 0 and \
+                all(compiled.flags == default_flags and compiled.groups == 0
+                    for compiled in self.ignored_namespace_patterns):
+            try:
+                self.ignored_namespace_regex = re.compile('|'.join(f'(?:{compiled.pattern})'
+                                                                   for compiled in self.ignored_namespace_patterns))
+            except re.error:
+                self.ignored_namespace_regex = None
+        self.is_ignored_namespace = functools.lru_cache(maxsize=NAMESPACE_CACHE_SIZE)(self.__match_ignored_namespace)
+
+        # the indexed namespaces are filtered again with the new patterns
+        if self.namespace_informer is not None:
+            self.namespace_informer.resync()
+
+    def __match_ignored_namespace(self, namespace):
+        if self.ignored_namespace_regex is not None:
+            return self.ignored_namespace_regex.match(namespace) is not None
+        return any(compiled.match(namespace) is not None for compiled in self.ignored_namespace_patterns)
 
     @handle_exceptions_method
-    def __filter_ignored_namespace(self, keys_list, regex_list):
-        # Compile regex patterns from the provided list
-        compiled_regex_list = [re.compile(pattern) for pattern in regex_list]
-
-        # Initialize an empty list for the output
-        filtered_keys = []
-        loop = 0
-        # Loop through each key
-        for key in keys_list:
-            loop += 1
-            # Flag to track if the key matches any regex pattern
-            match_found = False
-
-            # Check if the key matches any regex pattern
-            for pattern in compiled_regex_list:
-                if pattern.match(key):
-                    match_found = True
-                    break
-
-            # If no match is found, add the key to the filtered list
-            if not match_found:
-                filtered_keys.append(key)
-            else:
-                logger.debug(f'discard : {key}')
-
-        logger.debug(f'ignored namespace: {loop - len(filtered_keys)}')
-
-        return filtered_keys
+    def __filter_ignored_namespace(self, namespaces):
+        filtered = {name: labels for name, labels in namespaces.items() if not self.is_ignored_namespace(name)}
+
+        logger.debug(f'ignored namespace: {len(namespaces) - len(filtered)}')
+
+        return filtered
 
     @handle_exceptions_method
     def __get_k8s_namespace(self):
         # self.print_helper.debug('_get_namespace_list...')
 
-        # Get namespaces list
-        namespace_list = self.v1.list_namespace()
+        # the namespace informer keeps the coverage index updated, no list is required
+        if self.namespace_informer is not None and self.namespace_informer.has_synced():
+            return None
 
-        # Extract namespace list
-        namespaces = [namespace.metadata.name for namespace in namespace_list.items]
+        # Get namespaces list: name -> labels
+        namespaces, _ = list_namespace_metadata(self.v1, page_size=self.page_size,
+                                                request_timeout=self.request_timeout)
         # all_nm = 0
         # ignored_nm = 0
         # if len(namespaces) > 0:
@@ -75,7 +186,7 @@ class VeleroStatus:
 
         # LS 2023.11.23 add ignored namespace
         if len(self.ignored_namespace) > 0:
-            namespaces = self.__filter_ignored_namespace(namespaces, self.ignored_namespace)
+            namespaces = self.__filter_ignored_namespace(namespaces)
             # ignored_nm = all_nm - len(namespaces)
         # self.print_helper.debug(f'_get_namespace_list. all nm {all_nm} Ignored {ignored_nm}')
 
@@ -85,219 +196,99 @@ class VeleroStatus:
 
         return namespaces
 
-    @handle_exceptions_method
-    def __get_k8s_last_backups(self, namespace='velero'):
-
-        custom_api = self.client
-
-        # Get schedule from velero namespace
-        group = 'velero.io'
-        version = 'v1'
-        plural = 'backups'
-        backup_list = custom_api.list_namespaced_custom_object(group, version, namespace, plural)
-
-        last_backup_info = OrderedDict()
-
-        # Extract last backup for every schedule
-        for backup in backup_list.get('items', []):
-            try:
-                # if backup.get('metadata', {}).get('labels').get('velero.io/schedule-name'):
-                schedule_name = backup['metadata']['labels']['velero.io/schedule-name']
-            # else:
-            except:
-                schedule_name = None
-
-            nm = ''
-            if 'namespace' in backup:
-                nm = backup['namespace']
-
-            if backup['status'] != {}:
-                if 'phase' in backup['status']:
-                    phase = backup['status']['phase']
-                else:
-                    phase = ''
-                errors = backup['status'].get('errors', [])
-                warnings = backup['status'].get('warnings', [])
-                backup_name = backup['metadata']['name']
-
-                time_expires = ''
-                if 'phase' in backup['status']:
-                    time_expires = backup['status'].get('expiration', "N/A")
-                    time_expire__str = str(
-                        (datetime.strptime(time_expires, '%Y-%m-%dT%H:%M:%SZ') - datetime.now()).days) + 'd'
-                else:
-                    if 'progress' in backup['status']:
-                        time_expire__str = 'in progress'
-                    else:
-                        time_expire__str = 'N/A'
-
-                if 'completionTimestamp' in backup['status']:
-                    completion_timestamp = backup['status'].get('completionTimestamp')
-                else:
-                    completion_timestamp = 'N/A'
-
-                backup_same_schedule_name = None
-                schedules = []
-                backup_same_schedule_data = {}
-                if schedule_name is not None:
-                    schedules = [last_backup_info[item]["schedule"] for item in dict(last_backup_info)]
-                    backup_same_schedule_name = next(
-                        (item for item in last_backup_info if last_backup_info[item]["schedule"] == schedule_name),
-                        None)
-                    if backup_same_schedule_name is not None:
-                        backup_same_schedule_data = last_backup_info[backup_same_schedule_name]
-
-                if schedule_name is None \
-                        or (schedule_name is not None and schedule_name not in schedules) \
-                        or (schedule_name is not None and backup_same_schedule_data is not None and backup_name >
-                            backup_same_schedule_data['backup_name']):
-
-                    if backup_same_schedule_name is not None:
-                        del last_backup_info[backup_same_schedule_name]
-                    last_backup_info[backup_name] = {
-                        'backup_name': backup_name,
-                        'phase': phase,
-                        'namespace': nm,
-                        'errors': errors,
-                        'warnings': warnings,
-                        'time_expires': time_expires,
-                        'schedule': schedule_name,
-                        'completion_timestamp': completion_timestamp,
-                        'expire': time_expire__str
-                    }
-
-        return last_backup_info
+    @staticmethod
+    def __backup_order_key(backup_info):
+        """
+        Order backups by creation timestamp, then completion timestamp
+        """
+        return backup_info.created, backup_info.completed, backup_info.name
+
+    @staticmethod
+    def __index_last_backup(newest, backup_name, backup_info):
+        """
+        Keep in the index schedule name -> (order key, backup name) the newest backup of every schedule
+        """
+        schedule_name = backup_info.schedule
+        if schedule_name is None:
+            return
+        key = VeleroStatus.__backup_order_key(backup_info)
+        current = newest.get(schedule_name)
+        if current is None or key > current[0]:
+            newest[schedule_name] = (key, backup_name)
 
     @handle_exceptions_method
-    def __get_k8s_all_backups(self, namespace='velero'):
-
-        custom_api = self.client
-
-        # Get schedule from velero namespace
-        group = 'velero.io'
-        version = 'v1'
-        plural = 'backups'
-        backup_list = custom_api.list_namespaced_custom_object(group, version, namespace, plural)
+    def __get_k8s_last_backups(self, all_backups, newest):
+        """
+        Derive the last backup for every schedule from the all backups map
+        @param all_backups: backups returned by __get_k8s_all_backups
+        @param newest: index of the newest backup for every schedule
+        """
+        # keep backups without schedule and the newest backup of every schedule
         last_backup_info = OrderedDict()
-
-        for backup in backup_list.get('items', []):
-            try:
-                # if backup.get('metadata', {}).get('labels').get('velero.io/schedule-name'):
-                schedule_name = backup['metadata']['labels']['velero.io/schedule-name']
-            # else:
-            #    schedule_name = None
-            except:
-                schedule_name = None
-
-            nm = ''
-            if 'namespace' in backup:
-                nm = backup['namespace']
-
-            if backup['status'] != {}:
-                if 'phase' in backup['status']:
-                    phase = backup['status']['phase']
-                else:
-                    phase = ''
-                errors = backup['status'].get('errors', [])
-                warnings = backup['status'].get('warnings', [])
-                backup_name = backup['metadata']['name']
-
-                time_expires = ''
-                if 'phase' in backup['status']:
-                    time_expires = backup['status'].get('expiration', "N/A")
-                    # time_expire__str = str(time_expires)
-                    time_expire__str = str(
-                        (datetime.strptime(time_expires, '%Y-%m-%dT%H:%M:%SZ') - datetime.now()).days) + 'd'
-                else:
-                    if 'progress' in backup['status']:
-                        time_expire__str = 'in progress'
-                    else:
-                        time_expire__str = 'N/A'
-
-                if 'completionTimestamp' in backup['status']:
-                    completion_timestamp = backup['status'].get('completionTimestamp')
-                else:
-                    completion_timestamp = 'N/A'
-
-                last_backup_info[backup_name] = {
-                    'backup_name': backup_name,
-                    'phase': phase,
-                    'namespace': nm,
-                    'errors': errors,
-                    'warnings': warnings,
-                    'time_expires': time_expires,
-                    'schedule': schedule_name,
-                    'completion_timestamp': completion_timestamp,
-                    'expire': time_expire__str
-                }
+        for backup_name, backup_info in all_backups.items():
+            schedule_name = backup_info.schedule
+            if schedule_name is None or newest[schedule_name][1] == backup_name:
+                last_backup_info[backup_name] = backup_info
 
         return last_backup_info
 
-    @handle_exceptions_method
-    def __get_scheduled_namespaces(self):
-        all_ns = []
-        schedules = self.get_k8s_velero_schedules(namespace=config_app.get_k8s_velero_namespace())
-        for schedule in schedules:
-            all_ns = all_ns + schedules[schedule]['included_namespaces']
-        return all_ns
+    def iter_k8s_backups(self, namespace='velero'):
+        """
+        Yield the normalized backups chunk by chunk, a chunk for every page read from the api server
+        @param namespace: velero namespace
+        """
+        for page in self.__iter_velero_pages(namespace, 'backups'):
+            chunk = []
+            for backup in page:
+                # the informer records are immutable: they are shared by the snapshots of the cycles
+                backup_info = backup if isinstance(backup, BackupRecord) else BackupRecord.from_k8s(backup)
+                if backup_info is not None:
+                    chunk.append((backup_info.name, backup_info))
+            yield chunk
 
     @handle_exceptions_method
-    def __get_unscheduled_namespaces(self):
-        namespaces = self.__get_k8s_namespace()
-        all_included_namespaces = self.__get_scheduled_namespaces()
-
-        difference = list(set(namespaces) - set(all_included_namespaces))
-        difference.sort()
-        return difference, len(difference), len(namespaces)
-
-    @handle_exceptions_method
-    def __extract_resources_from_schedule(self, schedule):
-        try:
-            schedule_name = schedule['metadata']['name']
-            included_namespaces = []
-            included_resources = []
-            default_volumes_to_fs_backup = []
-            cron_time = ''
-            if 'spec' in schedule:
-                cron_time = schedule['spec']['schedule']
-                included_resources = schedule['spec'].get('includedResources', [])
-                included_namespaces = schedule['spec']['template'].get('includedNamespaces', [])
-                default_volumes_to_fs_backup = schedule['spec']['template'].get('defaultVolumesToFsBackup', [])
-
-            return schedule_name, included_namespaces, included_resources, default_volumes_to_fs_backup, cron_time
-        except Exception as e:
-            logger.error(f"extract resource from schedule {str(e)}")
+    def __get_k8s_all_backups(self, namespace='velero'):
+        """
+        Consume the backup chunks and build the all backups map and the newest backup index
+        """
+        all_backups = OrderedDict()
+        newest = {}
+        for chunk in self.iter_k8s_backups(namespace=namespace):
+            for backup_name, backup_info in chunk:
+                all_backups[backup_name] = backup_info
+                self.__index_last_backup(newest, backup_name, backup_info)
+
+        return all_backups, newest
 
     @handle_exceptions_method
     def get_k8s_velero_schedules(self, namespace='velero'):
 
-        custom_api = self.client
-
-        # Get schedule from velero namespace
-        group = 'velero.io'
-        version = 'v1'
-        plural = 'schedules'
-        schedule_list = custom_api.list_namespaced_custom_object(group, version, namespace, plural)
-
         schedules = {}
 
-        for schedule in schedule_list.get('items', []):
-            schedule_name, \
-                included_namespaces, \
-                included_resources, \
-                default_volumes_to_fs_backup, \
-                cron_time = self.__extract_resources_from_schedule(schedule)
-            schedules[schedule_name] = {
-                'included_namespaces': included_namespaces,
-                'included_resources': included_resources,
-                'default_volumes_to_fs_backup': default_volumes_to_fs_backup,
-                'cron_time': cron_time
-            }
+        for schedule in (item for page in self.__iter_velero_pages(namespace, 'schedules') for item in page):
+            if len(self.monitored_schedules) > 0 and schedule['metadata']['name'] not in self.monitored_schedules:
+                continue
+            try:
+                schedule_info = ScheduleRecord.from_k8s(schedule)
+                schedules[schedule_info.name] = schedule_info
+            except Exception as e:
+                logger.error(f"extract resource from schedule {str(e)}")
         return schedules
 
     @handle_exceptions_method
-    def get_unscheduled_namespaces(self):
-        difference, counter, counter_all = self.__get_unscheduled_namespaces()
+    def get_unscheduled_namespaces(self, schedules, namespaces=None):
+        """
+        Apply the changes of schedules and namespaces to the coverage index and read the namespaces
+        not included by any schedule
+        @param schedules: name -> ScheduleRecord
+        @param namespaces: name -> labels, None when the index is kept updated by the namespace informer
+        """
+        self.coverage.sync_schedules(schedules)
+        if namespaces is not None:
+            self.coverage.sync_namespaces(namespaces)
+
+        difference, counter_all = self.coverage.get_unscheduled()
+        counter = len(difference)
 
         unscheduled = {'difference': difference,
                        'counter': counter,
@@ -306,15 +297,87 @@ class VeleroStatus:
 
         return data
 
-    @handle_exceptions_method
-    def get_k8s_last_backups(self, namespace='velero'):
-        backups = self.__get_k8s_last_backups(namespace=namespace)
+    @staticmethod
+    def __check_result(result):
+        """
+        Raise the error returned by a method decorated with handle_exceptions_method
+        """
+        if isinstance(result, dict) and 'error' in result:
+            raise Exception(result['error']['description'])
+        return result
 
-        data = {self.k8s_config.backups_key: backups}
+    def __build_snapshot(self, schedules, backups, namespaces):
+        """
+        Build every view required by a cycle from the data read from the api server
+        """
+        data = {}
 
-        return data
+        schedules = self.__check_result(schedules)
+        if self.k8s_config.schedule_enable:
+            data[self.k8s_config.schedules_key] = schedules
+
+        if self.k8s_config.backup_enable:
+            all_backups, newest = self.__check_result(backups)
+            data[self.k8s_config.backups_key] = self.__get_k8s_last_backups(all_backups, newest)
+            data[self.k8s_config.all_backups_key] = all_backups
+
+            unscheduled_namespace = self.get_unscheduled_namespaces(schedules, self.__check_result(namespaces))
+            data[self.k8s_config.unschedule_namespace_key] = unscheduled_namespace[
+                self.k8s_config.unschedule_namespace_key]
+
+            self.__update_metrics(data)
 
-    def get_k8s_all_backups(self, namespace='velero'):
-        backups = self.__get_k8s_all_backups(namespace=namespace)
-        data = {self.k8s_config.all_backups_key: backups}
         return data
+
+    def __update_metrics(self, data):
+        """
+        Precompute the velero gauges of the snapshot, a scrape only reads them
+        """
+        by_phase = {}
+        last_success = {}
+        for backup_info in data[self.k8s_config.all_backups_key].values():
+            schedule_name = backup_info.schedule or ''
+            phase = backup_info.phase or 'Unknown'
+            by_phase[(schedule_name, phase)] = by_phase.get((schedule_name, phase), 0) + 1
+            if phase == 'Completed' and backup_info.schedule is not None \
+                    and backup_info.completed > last_success.get((schedule_name,), 0):
+                last_success[(schedule_name,)] = backup_info.completed
+
+        now = time.time()
+        last_by_phase = {}
+        in_warning_period = 0
+        for backup_info in data[self.k8s_config.backups_key].values():
+            phase = backup_info.phase or 'Unknown'
+            last_by_phase[(phase,)] = last_by_phase.get((phase,), 0) + 1
+            day = backup_info.expire_days(now)
+            if day is not None and 0 < day < self.k8s_config.expires_days_warning:
+                in_warning_period += 1
+
+        unscheduled = data[self.k8s_config.unschedule_namespace_key]
+
+        metrics.backups_by_phase.replace(by_phase)
+        metrics.last_backups_by_phase.replace(last_by_phase)
+        metrics.last_successful_backup.replace(last_success)
+        metrics.backups_in_warning_period.set(in_warning_period)
+        metrics.namespaces_total.set(unscheduled['counter_all'])
+        metrics.namespaces_unscheduled.set(unscheduled['counter'])
+
+    async def get_k8s_snapshot_async(self, namespace='velero'):
+        """
+        Read schedules and backups once and build every view required by a cycle: schedules, backups
+        and namespaces are read concurrently in the thread pool and the snapshot is built there,
+        the event loop only awaits the result
+        @param namespace: velero namespace
+        """
+        event_loop = asyncio.get_running_loop()
+
+        requests = [event_loop.run_in_executor(self.executor, self.get_k8s_velero_schedules, namespace)]
+        if self.k8s_config.backup_enable:
+            requests.append(event_loop.run_in_executor(self.executor, self.__get_k8s_all_backups, namespace))
+            requests.append(event_loop.run_in_executor(self.executor, self.__get_k8s_namespace))
+
+        results = await asyncio.gather(*requests)
+        if not self.k8s_config.backup_enable:
+            results += [None, None]
+
+        return await event_loop.run_in_executor(self.executor, self.__build_snapshot, *results)
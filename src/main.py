@@ -4,10 +4,11 @@ import sys
 
 from config.config import Config , get_configmap, get_secret_parameter
 
-from utils.logger import ColoredLogger, LEVEL_MAPPING
+from utils.logger import ColoredLogger, LEVEL_MAPPING, configure_logging
 import logging
 
 config_app = Config()
+configure_logging(config_app)
 
 logger = ColoredLogger.get_logger(__name__, level=LEVEL_MAPPING.get(config_app.get_internal_log_level(), logging.INFO))
 
@@ -17,20 +18,20 @@ logger.info("Loading config...")
 
 def load_user_config():
 
-    print("\nAdd user configs environment")
-    cm = get_configmap(namespace=os.getenv('K8S_VELERO_UI_NAMESPACE', 'velero-ui'),
-                       configmap_name=f"{os.getenv('HELM_RELEASE_NAME')}-watchdog-user-config")
+    logger.info("Add user configs environment")
+    cm = get_configmap(namespace=config_app.get_k8s_velero_ui_namespace(),
+                       configmap_name=config_app.get_user_configmap_name())
     if cm:
         # Update environment variables
         for key, value in cm.items():
-            print("Loading user config: Adding", key, value)
+            logger.info(f"Loading user config: Adding {key} {value}")
             os.environ[key] = value
 
-    apprise = get_secret_parameter(namespace=os.getenv('K8S_VELERO_UI_NAMESPACE', 'velero-ui'),
-                                   secret_name=f"{os.getenv('HELM_RELEASE_NAME')}-watchdog-user-secret", parameter="APPRISE")
+    apprise = get_secret_parameter(namespace=config_app.get_k8s_velero_ui_namespace(),
+                                   secret_name=config_app.get_user_secret_name(), parameter="APPRISE")
 
     if apprise:
-        print("Loading user secret: Adding APPRISE.....")
+        logger.info("Loading user secret: Adding APPRISE.....")
         os.environ["APPRISE"] = apprise
 
 
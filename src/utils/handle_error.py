@@ -2,6 +2,11 @@ from functools import wraps
 import sys
 import traceback
 
+from utils.logger import ColoredLogger
+import logging
+
+logger = ColoredLogger.get_logger(__name__, level=logging.INFO)
+
 
 def handle_exceptions_method(fn):
     from functools import wraps
@@ -13,8 +18,8 @@ def handle_exceptions_method(fn):
         except Exception as Ex:
             _, _, tb = sys.exc_info()
             exc_type, exc_obj, exc_tb = sys.exc_info()
-            print("E=%s, F=%s, L=%s" % (
-                str(Ex), traceback.extract_tb(exc_tb)[-1][0], traceback.extract_tb(exc_tb)[-1][1]))
+            logger.error("E=%s, F=%s, L=%s",
+                         str(Ex), traceback.extract_tb(exc_tb)[-1][0], traceback.extract_tb(exc_tb)[-1][1])
 
             return {'error': {"description": str(Ex),
                               "file": traceback.extract_tb(exc_tb)[-1][0],
@@ -37,8 +42,8 @@ def handle_exceptions_async_method(fn):
         except Exception as Ex:
             _, _, tb = sys.exc_info()
             exc_type, exc_obj, exc_tb = sys.exc_info()
-            print("E=%s, F=%s, L=%s" % (
-                str(Ex), traceback.extract_tb(exc_tb)[-1][0], traceback.extract_tb(exc_tb)[-1][1]))
+            logger.error("E=%s, F=%s, L=%s",
+                         str(Ex), traceback.extract_tb(exc_tb)[-1][0], traceback.extract_tb(exc_tb)[-1][1])
 
             return {'error': {"description": str(Ex),
                               "file": traceback.extract_tb(exc_tb)[-1][0],
@@ -0,0 +1,59 @@
+import threading
+
+from kubernetes import client, config
+
+# process wide api client: every CoreV1Api / CustomObjectsApi shares its connection pool
+_api_client = None
+_apis = {}
+_lock = threading.Lock()
+
+
+def _load_configuration():
+    """
+    Build the client configuration once. The token refresh hook installed by the config loaders
+    (in-cluster service account token rotation, kubeconfig exec/oidc providers) lives in this
+    configuration, it is called before every request and it is shared by all the clients
+    """
+    # imported here: config.config uses this module for its helpers
+    from config.config import Config
+    cl_config = Config()
+
+    configuration = client.Configuration()
+    if cl_config.k8s_incluster_mode():
+        config.load_incluster_config(client_configuration=configuration)
+    else:
+        try:
+            config.load_kube_config(config_file=cl_config.k8s_config_file(), client_configuration=configuration)
+        except config.ConfigException:
+            config.load_incluster_config(client_configuration=configuration)
+
+    # connections kept open for the informer watches, the api workers and the config helpers
+    configuration.connection_pool_maxsize = cl_config.k8s_api_pool_size()
+    return configuration
+
+
+def get_api_client() -> client.ApiClient:
+    """
+    Shared ApiClient, initialized at the first call
+    """
+    global _api_client
+    if _api_client is None:
+        with _lock:
+            if _api_client is None:
+                _api_client = client.ApiClient(configuration=_load_configuration())
+    return _api_client
+
+
+def _get_api(api_class):
+    api = _apis.get(api_class)
+    if api is None:
+        api = _apis.setdefault(api_class, api_class(api_client=get_api_client()))
+    return api
+
+
+def get_core_v1_api() -> client.CoreV1Api:
+    return _get_api(client.CoreV1Api)
+
+
+def get_custom_objects_api() -> client.CustomObjectsApi:
+    return _get_api(client.CustomObjectsApi)
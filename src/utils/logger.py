@@ -1,4 +1,11 @@
+import atexit
+import json
 import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 LEVEL_MAPPING = {
     'debug': logging.DEBUG,
@@ -19,30 +26,136 @@ COLORS = {
 RESET = '\033[0m'
 
 
+STREAM_FORMAT = '%(asctime)s - %(filename)s[%(lineno)d]->%(funcName)s - %(levelname)s %(message)s'
+
+
 class ColoredFormatter(logging.Formatter):
     """
     Custom formatter that adds color to messages based on level.
     """
 
     def format(self, record):
-        # Retrieve the layer and apply the corresponding color.
+        # Retrieve the layer and apply the corresponding color on a copy: the record is shared by all the sinks
         levelname = record.levelname
         if levelname in COLORS:
-            colored_levelname = f"{COLORS[levelname]}{levelname}{RESET}"
-            record.levelname = colored_levelname
-            record.msg = f"{COLORS[levelname]}{record.msg}{RESET}"
+            record = logging.makeLogRecord(record.__dict__)
+            record.levelname = f"{COLORS[levelname]}{levelname}{RESET}"
+            record.msg = f"{COLORS[levelname]}{record.getMessage()}{RESET}"
+            record.args = None
         return super().format(record)
 
 
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object for every record (JSON lines)
+    """
+
+    def __init__(self, app_key=None):
+        super().__init__()
+        self.app_key = app_key
+
+    def format(self, record):
+        entry = {'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+                 'level': record.levelname,
+                 'logger': record.name,
+                 'message': record.getMessage(),
+                 'file': record.filename,
+                 'line': record.lineno,
+                 'function': record.funcName,
+                 'thread': record.threadName}
+        if self.app_key:
+            entry['app'] = self.app_key
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Put the records in the queue of the listener thread. The message is merged with its
+    arguments in the caller, except the lazy payloads; the formatting is done by the listener
+    """
+
+    def prepare(self, record):
+        args = record.args if isinstance(record.args, tuple) else ()
+        if not any(isinstance(arg, LazyJson) for arg in args):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+_queue = queue.SimpleQueue()
+_queue_handler = _DeferredQueueHandler(_queue)
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _start_listener(handlers):
+    """
+    Replace the sinks of the listener thread, the records already in the queue are emitted by the new sinks
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+        _listener = QueueListener(_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
+
+def _stop_listener():
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+def _stream_handler(json_output=False, app_key=None):
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter(app_key) if json_output else ColoredFormatter(STREAM_FORMAT))
+    return handler
+
+
+def configure_logging(cl_config):
+    """
+    Set the sinks from the LOG_* settings: the console output (colored text or JSON lines)
+    and, when LOG_SAVE is enabled, a rotating file
+    @param cl_config: Config instance
+    """
+    json_output = cl_config.logger_json_output()
+    app_key = cl_config.logger_key()
+    handlers = [_stream_handler(json_output, app_key)]
+
+    if cl_config.logger_save_to_file():
+        folder = cl_config.logger_folder()
+        os.makedirs(folder, exist_ok=True)
+        file_handler = RotatingFileHandler(os.path.join(folder, cl_config.logger_filename()),
+                                           maxBytes=cl_config.logger_max_filesize(),
+                                           backupCount=cl_config.logger_his_backups_files(),
+                                           encoding='utf-8')
+        file_handler.setLevel(cl_config.logger_level())
+        file_handler.setFormatter(JsonFormatter(app_key) if json_output
+                                  else logging.Formatter(cl_config.logger_msg_format()))
+        handlers.append(file_handler)
+
+    _start_listener(handlers)
+
+
 class ColoredLogger:
     """
-    Class to get a configured logger with colored output.
+    Class to get a configured logger. The records are written by a listener thread,
+    the console output is colored until configure_logging sets the sinks.
     """
 
     @staticmethod
     def get_logger(name: str, level: int = logging.DEBUG) -> logging.Logger:
         """
-        Returns a logger with the colored formatter.
+        Returns a logger attached to the shared queue handler.
 
         :param name: Name of the logger.
         :param level: Level of logging (default: logging.DEBUG).
@@ -53,9 +166,58 @@ class ColoredLogger:
 
         # Check if the logger already has handlers to avoid duplicates.
         if not logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = ColoredFormatter('%(asctime)s - %(filename)s[%(lineno)d]->%(funcName)s - %(levelname)s %(message)s')
-            handler.setFormatter(formatter)
-            logger.addHandler(handler)
+            logger.addHandler(_queue_handler)
+
+        if _listener is None:
+            _start_listener([_stream_handler()])
 
         return logger
+
+
+class LazyJson:
+    """
+    Payload serialized as JSON only when the log record is emitted:
+    logger.debug("snapshot %s", LazyJson(data)) costs nothing when DEBUG is off.
+    """
+    __slots__ = ('obj', 'transform', 'kwargs')
+
+    def __init__(self, obj, transform=None, **kwargs):
+        """
+        @param obj: payload
+        @param transform: function applied to the payload before the serialization
+        @param kwargs: json.dumps arguments
+        """
+        self.obj = obj
+        self.transform = transform
+        self.kwargs = kwargs
+
+    def __str__(self):
+        obj = self.transform(self.obj) if self.transform is not None else self.obj
+        return json.dumps(obj, default=str, **self.kwargs)
+
+
+class SampledDump:
+    """
+    Log a full payload dump at DEBUG level once every N calls, to troubleshoot
+    large snapshots without paying the serialization of every cycle
+    """
+
+    def __init__(self, logger: logging.Logger, every=1):
+        """
+        @param logger: logger of the dump
+        @param every: dump one payload every N calls, 0 disables the dumps
+        """
+        self.logger = logger
+        self.every = every
+        self.calls = 0
+
+    def dump(self, msg, payload, transform=None, **kwargs):
+        """
+        @param msg: message with a %s placeholder for the payload
+        """
+        if self.every <= 0 or not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        self.calls += 1
+        if (self.calls - 1) % self.every == 0:
+            # stacklevel: the record points to the caller of dump
+            self.logger.debug(msg, LazyJson(payload, transform, **kwargs), stacklevel=2)
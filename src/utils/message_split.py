@@ -0,0 +1,64 @@
+def split_lines(message, limit):
+    """
+    Group the lines of the message in parts of at most limit characters, a line longer
+    than the limit is cut. Every line is copied once: linear in the message length
+    """
+    parts = []
+    current = []
+    size = 0
+    for line in message.splitlines(keepends=True):
+        if len(line) > limit:
+            if current:
+                parts.append(''.join(current))
+                current = []
+                size = 0
+            pieces = [line[index:index + limit] for index in range(0, len(line), limit)]
+            parts.extend(pieces[:-1])
+            line = pieces[-1]
+
+        if size + len(line) > limit:
+            parts.append(''.join(current))
+            current = []
+            size = 0
+        current.append(line)
+        size += len(line)
+
+    if current:
+        parts.append(''.join(current))
+    return parts
+
+
+def split_numbered(length, max_len, split):
+    """
+    Numbered parts of at most max_len characters, the "[i/n]\n" header is part of the length
+    @param length: length of the whole message, used to guess the number of parts
+    @param max_len: max length of a part
+    @param split: function(limit) returning the parts of at most limit characters
+    @return: list of parts
+    """
+    # retry with a larger header if n needs more digits
+    digits = len(str(length // max_len + 1))
+    while True:
+        limit = max_len - (2 * digits + 4)
+        if limit < 1:
+            # no room for the header
+            return split(max_len)
+        parts = split(limit)
+        if len(str(len(parts))) <= digits:
+            break
+        digits = len(str(len(parts)))
+
+    total = len(parts)
+    return [f"[{index}/{total}]\n{part}" for index, part in enumerate(parts, 1)]
+
+
+def split_message(message, max_len):
+    """
+    Split a message on line boundaries in numbered parts of at most max_len characters
+    @param message: body message
+    @param max_len: max length of a part, 0 or less for no limit
+    @return: list of parts, the message itself when it fits in a single part
+    """
+    if max_len <= 0 or len(message) <= max_len:
+        return [message]
+    return split_numbered(len(message), max_len, lambda limit: split_lines(message, limit))
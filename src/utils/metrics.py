@@ -0,0 +1,222 @@
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    if len(names) == 0:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    metric_type = ''
+
+    def __init__(self, registry, name, documentation, labels=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def header(self):
+        return f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.metric_type}\n"
+
+    def render(self):
+        lines = [self.header()]
+        for label_values, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}\n")
+        return ''.join(lines)
+
+
+class Gauge(_Metric):
+    metric_type = 'gauge'
+
+    def set(self, value, *label_values):
+        with self.registry.lock:
+            self.values[label_values] = value
+            self.registry.changed()
+
+    def replace(self, values):
+        """
+        Replace every series, the label sets not in values are removed
+        @param values: label values tuple -> value
+        """
+        with self.registry.lock:
+            self.values = dict(values)
+            self.registry.changed()
+
+
+class Counter(_Metric):
+    metric_type = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        with self.registry.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+            self.registry.changed()
+
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labels)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, *label_values):
+        with self.registry.lock:
+            series = self.values.get(label_values)
+            if series is None:
+                series = self.values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+            self.registry.changed()
+
+    def time(self, *label_values):
+        return _Timer(self, label_values)
+
+    def render(self):
+        lines = [self.header()]
+        bucket_labels = self.labels + ('le',)
+        for label_values, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(bucket_labels, label_values + (_format_value(float(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}\n")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}\n")
+            lines.append(f"{self.name}_count{labels} {count}\n")
+        return ''.join(lines)
+
+
+class _Timer:
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+
+
+class MetricsRegistry:
+    """
+    Metrics in Prometheus text format. The text of the stored series is cached and rendered again only
+    after a change; the values that depend on the scrape time are produced by the collectors
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+        self.lock = threading.Lock()
+        self.version = 0
+        self.cache_version = -1
+        self.cache = ''
+
+    def changed(self):
+        self.version += 1
+
+    def gauge(self, name, documentation, labels=()):
+        return self.__register(Gauge(self, name, documentation, labels))
+
+    def counter(self, name, documentation, labels=()):
+        return self.__register(Counter(self, name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.__register(Histogram(self, name, documentation, labels, buckets))
+
+    def __register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """
+        @param collector: function returning Prometheus text lines computed at scrape time
+        """
+        self.collectors.append(collector)
+
+    def render(self):
+        with self.lock:
+            if self.cache_version != self.version:
+                self.cache = ''.join(metric.render() for metric in self.metrics if len(metric.values) > 0)
+                self.cache_version = self.version
+            text = self.cache
+
+        dynamic = []
+        for collector in self.collectors:
+            try:
+                dynamic.append(collector())
+            except Exception:
+                pass
+        return text + ''.join(dynamic)
+
+
+registry = MetricsRegistry()
+
+# velero state, updated with every snapshot
+backups_by_phase = registry.gauge('velero_watchdog_backups',
+                                  'Velero backups by schedule and phase',
+                                  ('schedule', 'phase'))
+last_backups_by_phase = registry.gauge('velero_watchdog_last_backups',
+                                       'Last backup of every schedule and backups without schedule by phase',
+                                       ('phase',))
+backups_in_warning_period = registry.gauge('velero_watchdog_backups_in_warning_period',
+                                           'Last backups expiring in less than EXPIRES_DAYS_WARNING days')
+last_successful_backup = registry.gauge('velero_watchdog_last_successful_backup_timestamp_seconds',
+                                        'Completion time of the last completed backup of every schedule',
+                                        ('schedule',))
+namespaces_total = registry.gauge('velero_watchdog_namespaces',
+                                  'Namespaces not ignored')
+namespaces_unscheduled = registry.gauge('velero_watchdog_namespaces_unscheduled',
+                                        'Namespaces not included by any schedule')
+
+# watchdog internals
+cycle_duration = registry.histogram('velero_watchdog_cycle_duration_seconds',
+                                    'Time to read a snapshot of schedules, backups and namespaces')
+api_request_duration = registry.histogram('velero_watchdog_apiserver_request_duration_seconds',
+                                          'Latency of the api server list requests',
+                                          ('resource',))
+notifications = registry.counter('velero_watchdog_notifications_total',
+                                 'Notifications sent to every Apprise service by result',
+                                 ('service', 'result'))
+notifications_dead_letter = registry.counter('velero_watchdog_notifications_dead_letter_total',
+                                             'Notifications dropped after the max number of attempts',
+                                             ('service',))
+
+
+def _last_successful_backup_age():
+    now = time.time()
+    with registry.lock:
+        values = list(last_successful_backup.values.items())
+    if len(values) == 0:
+        return ''
+    name = 'velero_watchdog_last_successful_backup_age_seconds'
+    lines = [f"# HELP {name} Seconds since the last completed backup of every schedule\n# TYPE {name} gauge\n"]
+    for label_values, value in values:
+        lines.append(f"{name}{_format_labels(('schedule',), label_values)} {_format_value(round(now - value, 3))}\n")
+    return ''.join(lines)
+
+
+registry.add_collector(_last_successful_backup_age)
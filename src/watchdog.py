@@ -1,22 +1,28 @@
 import sys
 import asyncio
+import uuid
+from collections import OrderedDict
 from datetime import datetime
 
 from config.config import Config
 from config.config_k8s_process import ConfigK8sProcess
 from config.config_dispatcher import ConfigDispatcher
+from config.config_snapshot import reload_config_snapshot
 
 from core.kubernetes_status_run import KubernetesStatusRun
 from core.velero_checker import VeleroChecker
 from core.dispatcher import Dispatcher
 from core.dispatcher_apprise import DispatcherApprise
+from core.notification_outbox import NotificationOutbox
+from core.user_config_watcher import UserConfigWatcher
 
 from utils.handle_error import handle_exceptions_async_method
+from utils import metrics
 
 from app_data import __version__
 from app_data import __date__
 
-from utils.logger import ColoredLogger, LEVEL_MAPPING
+from utils.logger import ColoredLogger, LEVEL_MAPPING, configure_logging
 import logging
 
 config_app = Config()
@@ -31,6 +37,23 @@ class Watchdog:
         self.daemon_mode = daemon
         self.config_prg = Config()
 
+        self.dispatcher_apprise = None
+        self.k8s_stat_read = None
+        self.velero_checker = None
+
+        # queues exposed as metrics
+        self.queues = {}
+
+        # on demand reports: job id -> status, the oldest jobs are dropped
+        self.report_jobs = OrderedDict()
+        self.report_jobs_size = 100
+        # running report jobs: the event loop keeps only a weak reference to a task
+        self.report_tasks = set()
+
+        self.config_changed = asyncio.Event()
+        # changes of ConfigMap and Secret received within this time are applied together
+        self.config_reload_delay = 2
+
         self.loop_seconds = self.config_prg.process_run_sec()
         self.clk8s_setup_disp = ConfigDispatcher(self.config_prg)
         self.clk8s_setup = ConfigK8sProcess(self.config_prg)
@@ -64,6 +87,14 @@ class Watchdog:
         queue_dispatcher = asyncio.Queue()
         # queue_dispatcher_apprise = asyncio.Queue()
 
+        # the outbox is used only by the daemon, a one-shot report does not replay old messages
+        outbox = None
+        if daemon and disp_class.outbox_file:
+            try:
+                outbox = NotificationOutbox(disp_class.outbox_file)
+            except Exception as e:
+                logger.error(f"Notification outbox {disp_class.outbox_file} not available: {str(e)}")
+
         tasks.append(KubernetesStatusRun(queue_request=self.queue_request,
                                          queue=queue_data,
                                          cycles_seconds=seconds,
@@ -75,7 +106,8 @@ class Watchdog:
                                    dispatcher_max_msg_len=disp_class.max_msg_len,
                                    dispatcher_alive_message_hours=disp_class.alive_message,
                                    k8s_key_config=k8s_class,
-                                   daemon=daemon
+                                   daemon=daemon,
+                                   outbox=outbox
                                    ))
         velero_stat_checker = tasks[-1]
 
@@ -90,15 +122,33 @@ class Watchdog:
         #                                ))
 
         tasks.append(DispatcherApprise(queue=queue_dispatcher,
-                                       dispatcher_config=disp_class
+                                       dispatcher_config=disp_class,
+                                       outbox=outbox
                                        ))
 
         dispatcher_apprise = tasks[-1]
+        self.dispatcher_apprise = dispatcher_apprise
+        self.k8s_stat_read = k8s_stat_read
+        self.velero_checker = velero_stat_checker
+        self.queues = {'data': queue_data, 'dispatcher': queue_dispatcher}
+
+        global _metrics_watchdog
+        _metrics_watchdog = self
 
         try:
 
             if daemon:
-                await asyncio.gather(*[t.run() for t in tasks])
+                user_config_watcher = None
+                if self.config_prg.user_config_watch_enable():
+                    # the api client of the status reader is shared, no new client is created
+                    user_config_watcher = UserConfigWatcher(k8s_stat_read.velero_stat.v1,
+                                                            namespace=self.config_prg.get_k8s_velero_ui_namespace(),
+                                                            configmap_name=self.config_prg.get_user_configmap_name(),
+                                                            secret_name=self.config_prg.get_user_secret_name(),
+                                                            request_timeout=k8s_stat_read.velero_stat.request_timeout)
+                    user_config_watcher.start(asyncio.get_running_loop(), self.config_changed.set)
+
+                await asyncio.gather(*[t.run() for t in tasks], self.__config_reload_loop())
                 self.tasks = tasks
             else:
                 await k8s_stat_read.run(loop=False)
@@ -112,12 +162,115 @@ class Watchdog:
         except Exception as e:
             logger.error(f"main_start ${str(e)}")
 
+    async def __config_reload_loop(self):
+        while True:
+            await self.config_changed.wait()
+            await asyncio.sleep(self.config_reload_delay)
+            self.config_changed.clear()
+            try:
+                self.reload_config()
+            except Exception as e:
+                logger.error(f"reload config {str(e)}")
+
+    def reload_config(self):
+        """
+        Apply the configuration read again from the environment: the queues, the pending retries
+        and the kubernetes clients are kept
+        """
+        snapshot = reload_config_snapshot()
+        logger.info(f"Reload config: version {snapshot.version}")
+
+        self.loop_seconds = snapshot.process_run_sec
+
+        self.clk8s_setup.backup_enable = snapshot.backup_enable
+        self.clk8s_setup.schedule_enable = snapshot.schedule_enable
+        self.clk8s_setup.expires_days_warning = snapshot.expires_days_warning
+        self.clk8s_setup.ignore_namespace = list(snapshot.ignore_namespace)
+        if self.k8s_stat_read is not None:
+            self.k8s_stat_read.cycle_seconds = snapshot.process_run_sec
+            self.k8s_stat_read.velero_stat.set_ignored_namespace(snapshot.ignore_namespace)
+
+        self.clk8s_setup_disp.apprise_configs = list(snapshot.apprise_config)
+        if self.dispatcher_apprise is not None:
+            self.dispatcher_apprise.load_config()
+
+    def get_queue_depths(self):
+        """
+        Items waiting in the queues: queue name -> depth
+        """
+        depths = {name: queue.qsize() for name, queue in self.queues.items()}
+        depths['report_requests'] = self.queue_request.qsize()
+        if self.dispatcher_apprise is not None:
+            depths['notification_retries'] = sum(len(pending) for pending in
+                                                 self.dispatcher_apprise.retry_queues.values())
+        return depths
+
+    async def request_report(self, refresh=False):
+        """
+        Queue a full report built from the last snapshot of the daemon
+        @param refresh: read a new snapshot before the report, the concurrent requests share the read
+        @return: job id
+        """
+        job_id = uuid.uuid4().hex
+        self.report_jobs[job_id] = {'status': 'pending',
+                                    'refresh': refresh,
+                                    'created_at': self.__get_utc_datetime_string__()}
+        while len(self.report_jobs) > self.report_jobs_size:
+            self.report_jobs.popitem(last=False)
+
+        task = asyncio.create_task(self.__run_report_job(job_id, refresh))
+        self.report_tasks.add(task)
+        task.add_done_callback(self.report_tasks.discard)
+        return job_id
+
+    async def __run_report_job(self, job_id, refresh):
+        job = self.report_jobs.get(job_id, {})
+        try:
+            if self.k8s_stat_read is None or self.velero_checker is None:
+                raise Exception("watchdog daemon not running")
+            data = await self.k8s_stat_read.get_snapshot(refresh=refresh)
+            job['snapshot_time'] = datetime.utcfromtimestamp(self.k8s_stat_read.last_snapshot_time).strftime(
+                "%Y-%m-%dT%H:%M:%SZ")
+            queued = await self.velero_checker.send_report(data)
+            job['status'] = 'queued' if queued else 'empty'
+        except Exception as e:
+            logger.error(f"report job {job_id}: {str(e)}")
+            job['status'] = 'error'
+            job['error'] = str(e)
+
+    async def get_report_job(self, job_id):
+        return self.report_jobs.get(job_id)
+
     async def get_env(self):
         return config_app.get_env_variables()
 
+    async def get_dead_letters(self):
+        if self.dispatcher_apprise is None:
+            return []
+        return self.dispatcher_apprise.get_dead_letters()
+
+
+# watchdog whose queues are exposed as metrics, the last one started
+_metrics_watchdog = None
+
+
+def _render_queue_depths():
+    if _metrics_watchdog is None:
+        return ''
+    name = 'velero_watchdog_queue_depth'
+    lines = [f"# HELP {name} Items waiting in the watchdog queues\n# TYPE {name} gauge\n"]
+    for queue_name, depth in _metrics_watchdog.get_queue_depths().items():
+        lines.append(f'{name}{{queue="{queue_name}"}} {depth}\n')
+    return ''.join(lines)
+
+
+# registered once for the process, not for every Watchdog instance
+metrics.registry.add_collector(_render_queue_depths)
+
 
 if __name__ == "__main__":
-    print(f"INFO    [SYSTEM] start application version {__version__} release date {__date__}")
+    configure_logging(config_app)
+    logger.info(f"[SYSTEM] start application version {__version__} release date {__date__}")
 
     daemon_mode = False
     if len(sys.argv) > 1 and '--daemon' in sys.argv: